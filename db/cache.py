@@ -0,0 +1,153 @@
+# cache.py
+"""
+统一的缓存模块
+
+每个缓存是一个命名区域（CacheRegion）：有界 LRU，可选 TTL，统计命中、未命中、淘汰、过期和失效次数。
+条目写入时带上数据版本标签（database.get_read_version() 的值），读取时标签不一致的条目视为失效并删除，
+数据文件变化后不需要逐个清理缓存；也可以用 invalidate()/invalidate_all() 显式失效。
+
+缓存的值由所有调用方共享，调用方不要原地修改。
+"""
+import time
+import threading
+import functools
+from collections import OrderedDict
+
+
+class CacheRegion:
+    """命名的有界 LRU 缓存区域（线程安全）"""
+
+    def __init__(self, name, max_entries=512, ttl=None):
+        """
+        :param name: 区域名称（统计接口中使用）
+        :param max_entries: 最多保存的条目数，超出时淘汰最久未使用的
+        :param ttl: 条目的有效秒数，为 None 时不过期
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # 键 -> (值, 版本标签, 过期时间)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, tag=None):
+        """命中时返回缓存值并标记为最近使用；不存在、已过期或版本标签不一致时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, entry_tag, expires_at = entry
+            if entry_tag != tag:
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            if expires_at is not None and time.monotonic() > expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, tag=None):
+        """保存缓存值（不能为 None），tag 为数据版本标签"""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, tag, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, tag=None):
+        """
+        命中时返回缓存值，否则调用 loader() 并缓存结果（结果为 None 时不缓存）
+        tag 应在调用 loader 之前取得：加载期间数据变化时，结果带着旧标签，下次读取即失效
+        """
+        value = self.get(key, tag)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.put(key, value, tag)
+        return value
+
+    def invalidate(self, tag=None):
+        """tag 为 None 时清空区域，否则删除版本标签不等于 tag 的条目"""
+        with self._lock:
+            if tag is None:
+                stale = list(self._entries)
+            else:
+                stale = [key for key, entry in self._entries.items() if entry[1] != tag]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        """命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+# 区域名称 -> CacheRegion
+_regions = {}
+_regions_lock = threading.Lock()
+
+
+def cache_region(name, max_entries=512, ttl=None):
+    """返回指定名称的缓存区域，不存在时按给定的大小和 TTL 创建"""
+    with _regions_lock:
+        region = _regions.get(name)
+        if region is None:
+            region = _regions[name] = CacheRegion(name, max_entries, ttl)
+        return region
+
+
+def invalidate_all(tag=None):
+    """失效所有区域中版本标签不等于 tag 的条目（tag 为 None 时清空所有区域）"""
+    with _regions_lock:
+        regions = list(_regions.values())
+    for region in regions:
+        region.invalidate(tag)
+
+
+def cache_stats():
+    """所有区域的命中统计，按区域名称排序"""
+    with _regions_lock:
+        regions = sorted(_regions.items())
+    return {name: region.stats() for name, region in regions}
+
+
+def cached(name, tag_func, max_entries=512, ttl=None):
+    """
+    缓存函数结果的装饰器：键为调用参数，标签为调用 tag_func() 得到的数据版本
+    被装饰的函数返回 None 时不缓存
+    """
+    region = cache_region(name, max_entries, ttl)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+            return region.get_or_load(key, lambda: func(*args, **kwargs), tag_func())
+        wrapper.cache_region = region
+        return wrapper
+    return decorator
@@ -0,0 +1,336 @@
+# consistency_checks.py
+"""
+一致性检查
+
+可重复运行的检查：
+- 列表查询：下推到 SQL 的 query_pokemon / query_moves / query_items 的当前页、过滤后总数和
+  下一页的 after_id，与在 get_all_* 的结果上用 Python 逐条过滤再切片得到的结果比较；
+- 名称搜索：/api/pokemon/search/{name} 使用的 PokemonIndex 与 /api/pokemon?search= 使用的
+  query_pokemon 对同一查询返回相同的宝可梦；
+- 性别过滤：GENDER_FILTERS 中提供的每个过滤值都至少返回一个宝可梦；
+- 增量导入：在临时复制的爬虫输出上依次做修改、删除、恢复等变化，每次变化后分别增量导入和
+  完整导入，比较两个数据库各表的内容。
+
+运行 python db/consistency_checks.py（列表查询检查 db/pokemon.db），有检查未通过时退出码为1；
+加 --skip-ingest 时跳过较慢的增量导入检查
+"""
+import os
+import io
+import sys
+import json
+import random
+import shutil
+import sqlite3
+import tempfile
+import contextlib
+try:
+    from . import database
+    from .pokemon_index import PokemonIndex, GEN_RANGES
+    from .gender_ratio import GENDER_FILTERS
+    from .ingest_manifest import SPIDER_ROOT
+    from .dataset import DATASET_SOURCES
+except ImportError:
+    import database
+    from pokemon_index import PokemonIndex, GEN_RANGES
+    from gender_ratio import GENDER_FILTERS
+    from ingest_manifest import SPIDER_ROOT
+    from dataset import DATASET_SOURCES
+
+# 每个列表查询随机生成的过滤条件组数（固定随机种子，结果可重复）
+LIST_QUERY_CASES = 300
+LIST_QUERY_SEED = 13
+
+
+def _contains(row, fields, text):
+    """与原实现一致：任一非空字段包含 text（不区分大小写）"""
+    text = text.lower()
+    return any(text in row[field].lower() for field in fields if row.get(field))
+
+
+def _reference_page(rows, predicate, skip, limit, after_id):
+    """参考实现：按原列表顺序逐条过滤，再按 after_id、skip、limit 切片"""
+    matched = [row for row in rows if predicate(row)]
+    remaining = [row for row in matched if after_id is None or row['id'] > after_id]
+    page = remaining[skip:skip + limit]
+    next_after_id = page[-1]['id'] if len(remaining) > skip + limit else None
+    return page, len(matched), next_after_id
+
+
+def _sample_text(rng, rows, fields):
+    """从数据中取一个名称片段作为过滤文本，偶尔改变大小写或使用不存在的文本"""
+    choice = rng.random()
+    if choice < 0.3:
+        return None
+    if choice < 0.35:
+        return "不存在的名称zzz"
+    values = [row[field] for row in rng.sample(rows, 3) for field in fields if row.get(field)]
+    if not values:
+        return None
+    value = rng.choice(values)
+    start = rng.randrange(len(value))
+    text = value[start:start + rng.randint(1, 4)]
+    return text.upper() if rng.random() < 0.3 else text
+
+
+def _sample_page(rng, rows):
+    """随机的分页参数 (skip, limit, after_id)"""
+    after_id = rng.choice(rows)['id'] if rows and rng.random() < 0.4 else None
+    return rng.choice((0, 0, 0, 1, 7, 50)), rng.choice((1, 5, 20, 50, 100)), after_id
+
+
+def _compare(results, description, actual, expected):
+    """记录一组比较结果"""
+    ok = actual == expected
+    detail = "" if ok else (f"总数 {actual[1]} / {expected[1]}，下一页 {actual[2]} / {expected[2]}，"
+                            f"当前页 {len(actual[0])} / {len(expected[0])} 行")
+    results.append((description, ok, detail))
+
+
+def check_list_queries(cases=LIST_QUERY_CASES, seed=LIST_QUERY_SEED):
+    """
+    比较列表查询与参考实现
+    :return: [(说明, 是否一致, 不一致时的说明), ...]
+    """
+    rng = random.Random(seed)
+    results = []
+
+    pokemon = database.get_all_pokemon()
+    types = sorted({p[field] for p in pokemon for field in ('type1', 'type2') if p.get(field)})
+    for _ in range(cases):
+        search = _sample_text(rng, pokemon, ('name', 'en_name', 'jp_name'))
+        if search is not None and rng.random() < 0.2:
+            search = str(rng.choice(pokemon)['id'])
+        type_filter = rng.choice([None, None, rng.choice(types), rng.choice(types).lower()[1:4]])
+        generation = rng.choice([None] * 6 + [0, 10] + list(GEN_RANGES))
+        skip, limit, after_id = _sample_page(rng, pokemon)
+
+        def predicate(p):
+            if generation in GEN_RANGES and not GEN_RANGES[generation][0] <= p['id'] <= GEN_RANGES[generation][1]:
+                return False
+            if search and not (_contains(p, ('name', 'en_name', 'jp_name'), search)
+                               or (search.isdigit() and p['id'] == int(search))):
+                return False
+            return not type_filter or _contains(p, ('type1', 'type2'), type_filter)
+
+        actual = database.query_pokemon(skip=skip, limit=limit, type_filter=type_filter, search=search,
+                                        generation=generation, after_id=after_id)
+        _compare(results, f"宝可梦 search={search!r} type={type_filter!r} generation={generation} "
+                          f"skip={skip} limit={limit} after_id={after_id}",
+                 actual, _reference_page(pokemon, predicate, skip, limit, after_id))
+
+    moves = database.get_all_moves()
+    for _ in range(cases):
+        search = _sample_text(rng, moves, ('name',))
+        type_filter = _sample_text(rng, moves, ('type',))
+        category_filter = _sample_text(rng, moves, ('category',))
+        skip, limit, after_id = _sample_page(rng, moves)
+
+        def predicate(m):
+            return ((not search or _contains(m, ('name',), search))
+                    and (not type_filter or _contains(m, ('type',), type_filter))
+                    and (not category_filter or _contains(m, ('category',), category_filter)))
+
+        actual = database.query_moves(skip=skip, limit=limit, type_filter=type_filter,
+                                      category_filter=category_filter, search=search, after_id=after_id)
+        _compare(results, f"技能 search={search!r} type={type_filter!r} category={category_filter!r} "
+                          f"skip={skip} limit={limit} after_id={after_id}",
+                 actual, _reference_page(moves, predicate, skip, limit, after_id))
+
+    items = database.get_all_items()
+    for _ in range(cases):
+        search = _sample_text(rng, items, ('name', 'english'))
+        category_filter = _sample_text(rng, items, ('category',))
+        skip, limit, after_id = _sample_page(rng, items)
+
+        def predicate(item):
+            return ((not search or _contains(item, ('name', 'english'), search))
+                    and (not category_filter or _contains(item, ('category',), category_filter)))
+
+        actual = database.query_items(skip=skip, limit=limit, category_filter=category_filter,
+                                      search=search, after_id=after_id)
+        _compare(results, f"物品 search={search!r} category={category_filter!r} "
+                          f"skip={skip} limit={limit} after_id={after_id}",
+                 actual, _reference_page(items, predicate, skip, limit, after_id))
+    return results
+
+
+def check_name_search(cases=LIST_QUERY_CASES, seed=LIST_QUERY_SEED):
+    """
+    检查名称搜索的两条路径结果一致：PokemonIndex.search 与 query_pokemon(search=...) 返回的编号相同
+    :return: [(说明, 是否通过, 不通过时的说明), ...]
+    """
+    rng = random.Random(seed)
+    pokemon = database.get_all_pokemon()
+    index = PokemonIndex(pokemon)
+    results = []
+    for _ in range(cases):
+        search = _sample_text(rng, pokemon, ('name', 'en_name', 'jp_name'))
+        if not search:
+            # 纯数字的查询同时匹配名称子串和序号
+            search = str(rng.choice(pokemon)['id'])[:rng.randint(1, 3)]
+        indexed = [p['id'] for p in index.search(search)]
+        queried, _, _ = database.query_pokemon(limit=len(pokemon), search=search, with_total=False)
+        queried = [p['id'] for p in queried]
+        results.append((f"名称搜索 {search!r}", indexed == queried,
+                        f"索引 {indexed[:10]} 与 SQL {queried[:10]} 不一致" if indexed != queried else ""))
+    return results
+
+
+def check_gender_filters():
+    """
+    检查每个提供的性别过滤值至少返回一个宝可梦（数据无法区分的过滤值不应提供）
+    :return: [(说明, 是否通过, 不通过时的说明), ...]
+    """
+    results = []
+    for gender in GENDER_FILTERS:
+        _, total, _ = database.query_pokemon(limit=1, gender=gender)
+        results.append((f"性别过滤 {gender}", total > 0, "" if total else "没有宝可梦"))
+    return results
+
+
+# 增量导入检查比较的表；导入清单不比较导入时间
+INGEST_TABLES = ('pokemon', 'pokemon_forms', 'moves', 'items', 'evolutions', 'pokemon_moves', 'ingest_manifest')
+INGEST_IGNORED_COLUMNS = {'ingest_manifest': {'ingested_at'}}
+
+
+def _edit_json(path, edit):
+    """读取JSON文件，用 edit 修改后写回"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    edit(data)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _remove_matching(directory, prefix):
+    for name in os.listdir(directory):
+        if name.startswith(prefix):
+            os.remove(os.path.join(directory, name))
+
+
+def _touch_first(directory):
+    os.utime(os.path.join(directory, sorted(os.listdir(directory))[0]))
+
+
+# 依次作用在临时爬虫输出上的变化 (说明, 函数(爬虫输出目录))，覆盖增量导入中按编号分组、
+# 技能id映射变化和删除的各个分支
+INGEST_SCENARIOS = [
+    ("没有变化", lambda root: None),
+    ("修改宝可梦技能文件", lambda root: _edit_json(
+        os.path.join(root, 'pokemon_moves_data/25_pikachu.json'),
+        lambda d: d.update(level_up=d['level_up'][:5]))),
+    ("重命名技能（技能id映射变化）", lambda root: _edit_json(
+        os.path.join(root, 'moves/57_surf.json'), lambda d: d.update(name='Surf Renamed'))),
+    ("修改宝可梦描述", lambda root: _edit_json(
+        os.path.join(root, 'pokemon_descrptions/1_bulbasaur.json'), lambda d: d.update(description='新的描述'))),
+    ("删除宝可梦的基础形态文件", lambda root: os.remove(os.path.join(root, 'pokemon_data_all/25_pikachu.json'))),
+    ("删除宝可梦的全部形态", lambda root: _remove_matching(os.path.join(root, 'pokemon_data_all'), '25_')),
+    ("恢复宝可梦", lambda root: shutil.copy2(os.path.join(SPIDER_ROOT, 'pokemon_data_all/25_pikachu.json'),
+                                        os.path.join(root, 'pokemon_data_all/25_pikachu.json'))),
+    ("删除被技能文件引用的技能", lambda root: os.remove(os.path.join(root, 'moves/85_thunderbolt.json'))),
+    ("只修改物品文件的修改时间", lambda root: _touch_first(os.path.join(root, 'items'))),
+]
+
+
+def _dump_tables(db_file):
+    """读取 INGEST_TABLES 中各表的全部行（排序后比较，与写入顺序和 rowid 无关）"""
+    conn = sqlite3.connect(db_file)
+    try:
+        tables = {}
+        for table in INGEST_TABLES:
+            ignored = INGEST_IGNORED_COLUMNS.get(table, set())
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[1] not in ignored]
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall()
+            tables[table] = sorted(rows, key=repr)
+        return tables
+    finally:
+        conn.close()
+
+
+def _import_insert_data():
+    """
+    导入脚本 insert_data，返回 (insert_data, 它使用的 database 模块)
+    insert_data 以绝对方式导入 database，切换数据库文件时要修改它使用的那个模块
+    """
+    db_dir = os.path.dirname(os.path.abspath(__file__))
+    if db_dir not in sys.path:
+        sys.path.append(db_dir)
+    import insert_data
+    return insert_data, sys.modules[insert_data.init_db.__module__]
+
+
+def check_delta_ingest(scenarios=None):
+    """
+    在临时目录中比较增量导入和完整导入（不修改 db/pokemon.db 和爬虫输出）
+    :return: [(说明, 是否一致, 不一致时的说明), ...]
+    """
+    if scenarios is None:
+        scenarios = INGEST_SCENARIOS
+    insert_data, ingest_db = _import_insert_data()
+    previous_path = ingest_db.DB_PATH
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        spider_root = os.path.join(tmp, "spider")
+        for directory in DATASET_SOURCES.values():
+            shutil.copytree(os.path.join(SPIDER_ROOT, directory), os.path.join(spider_root, directory))
+        dataset_file = os.path.join(tmp, "dataset.db")
+
+        def ingest(db_file, func):
+            # 导入过程的输出很多，只保留检查结果
+            ingest_db.close_db()
+            ingest_db.DB_PATH = db_file
+            with contextlib.redirect_stdout(io.StringIO()):
+                func(spider_root, dataset_file)
+            ingest_db.close_db()
+
+        def new_database(name):
+            # 从空数据库复制，不再执行迁移（迁移的回填读取默认数据集，而不是这里的临时数据集）
+            db_file = os.path.join(tmp, name)
+            shutil.copyfile(empty_file, db_file)
+            return db_file
+
+        try:
+            # 已应用全部迁移、数据表为空的数据库
+            empty_file = os.path.join(tmp, "empty.db")
+            ingest(empty_file, lambda *_: insert_data.init_db())
+            conn = sqlite3.connect(empty_file)
+            with conn:
+                for table in INGEST_TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+            conn.close()
+
+            delta_file = new_database("delta.db")
+            ingest(delta_file, insert_data.insert_all_data)
+            for number, (description, change) in enumerate(scenarios):
+                change(spider_root)
+                ingest(delta_file, insert_data.insert_changed_data)
+                full_file = new_database(f"full_{number}.db")
+                ingest(full_file, insert_data.insert_all_data)
+                delta, full = _dump_tables(delta_file), _dump_tables(full_file)
+                different = [table for table in INGEST_TABLES if delta[table] != full[table]]
+                results.append((f"增量导入: {description}", not different,
+                                f"不一致的表: {', '.join(different)}" if different else ""))
+        finally:
+            ingest_db.close_db()
+            ingest_db.DB_PATH = previous_path
+    return results
+
+
+def report(title, results):
+    """打印检查结果（只逐条列出未通过的），返回是否全部通过"""
+    failed = [(description, detail) for description, ok, detail in results if not ok]
+    for description, detail in failed:
+        print(f"[失败] {description}: {detail}")
+    print(f"[{'OK' if not failed else '失败'}] {title}: {len(results) - len(failed)}/{len(results)} 通过")
+    return not failed
+
+
+if __name__ == "__main__":
+    all_ok = report("列表查询与逐条过滤", check_list_queries())
+    all_ok = report("名称搜索索引与SQL搜索", check_name_search()) and all_ok
+    all_ok = report("性别过滤", check_gender_filters()) and all_ok
+    database.close_db()
+    if "--skip-ingest" not in sys.argv[1:]:
+        all_ok = report("增量导入与完整导入", check_delta_ingest()) and all_ok
+    if not all_ok:
+        raise SystemExit(1)
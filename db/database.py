@@ -1,28 +1,596 @@
 # database.py
 import os
 import json
+import time
+import base64
+import sqlite3
+import itertools
+import asyncio
+import functools
+import threading
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 try:
     from .pokemon_db_init import PokemonDB
+    from .pokemon_forms import (
+        FORM_FIELDS, MEGA_GMAX_KINDS, INSERT_FORM_SQL, form_row_values, form_row_to_pokemon
+    )
+    from .stats_materializer import StatsMaterializer
+    from .pokemon_index import GEN_RANGES
+    from .cache import cache_region, cached
+    from .gender_ratio import GENDER_FILTERS, gender_columns, with_gender_ratio
+    from .search_index import (
+        SEARCH_SOURCES, SEARCH_RESULT_FIELDS, split_terms, build_match_query, match_sql, scan_query, make_snippet,
+        mark_snippet
+    )
+    from .evolution_graph import EVOLUTION_COLUMNS
+    from .ingest_manifest import UPSERT_MANIFEST_SQL, DELETE_MANIFEST_SQL
+    from .learnsets import LEARN_METHODS, POKEMON_MOVE_COLUMNS, build_move_id_map
+    from .dataset import DATASET_PATH, Dataset
 except ImportError:
     # 如果相对导入失败，尝试绝对导入
     from pokemon_db_init import PokemonDB
+    from pokemon_forms import (
+        FORM_FIELDS, MEGA_GMAX_KINDS, INSERT_FORM_SQL, form_row_values, form_row_to_pokemon
+    )
+    from stats_materializer import StatsMaterializer
+    from pokemon_index import GEN_RANGES
+    from cache import cache_region, cached
+    from gender_ratio import GENDER_FILTERS, gender_columns, with_gender_ratio
+    from search_index import (
+        SEARCH_SOURCES, SEARCH_RESULT_FIELDS, split_terms, build_match_query, match_sql, scan_query, make_snippet,
+        mark_snippet
+    )
+    from evolution_graph import EVOLUTION_COLUMNS
+    from ingest_manifest import UPSERT_MANIFEST_SQL, DELETE_MANIFEST_SQL
+    from learnsets import LEARN_METHODS, POKEMON_MOVE_COLUMNS, build_move_id_map
+    from dataset import DATASET_PATH, Dataset
 
 # 使用绝对路径设置数据库路径
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db/pokemon.db")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(PROJECT_ROOT, "db/pokemon.db")
 
-# 创建数据库实例
+# 只读查询线程池的大小
+DB_READ_WORKERS = 4
+
+# 创建数据库实例（写连接，只在创建它的线程中使用）
 db_instance = None
 
+# 只读连接：每个线程一个，查询在有界线程池中执行
+_read_local = threading.local()
+_read_connections = []
+_read_connections_lock = threading.Lock()
+_read_executor = None
+
+# 服务模式的内存副本：用 backup API 把数据库复制到共享缓存的内存数据库，读连接只访问副本；
+# 没有开启时（导入工具等）读连接直接打开磁盘文件。
+# 副本只在启动和后台刷新时建立（build_memory_replica），与用它加载的快照一起发布（publish_memory_replica），
+# 请求不会触发重建；仍在使用旧副本的请求不受发布新副本的影响
+_memory_replica_enabled = False
+_memory_replica = None  # 已发布的副本（MemoryReplica）
+# 当前上下文固定使用的副本（API 在请求开始时固定为当前快照的副本，run_db 把它带入查询线程）
+_pinned_replica = contextvars.ContextVar("pinned_replica", default=None)
+_memory_replica_names = itertools.count(1)
+_memory_replica_stats = {"builds": 0, "last_build_duration": 0.0}
+
+class MemoryReplica:
+    """
+    一个内存副本：共享缓存内存数据库的 URI、复制时的数据版本和保持内存数据库存在的连接
+    副本对象不再被引用（快照被替换、请求结束）时立即关闭这个连接。sqlite3 连接自身带有引用环，
+    不显式关闭要等到循环垃圾回收才释放；内存数据库在仍连接它的读连接都切换到新副本后释放
+    """
+
+    def __init__(self, uri, version, anchor):
+        self.uri = uri
+        self.version = version
+        self.anchor = anchor
+
+    def __del__(self):
+        self.anchor.close()
+
 def init_db():
     """初始化数据库，从pokemon_db_init.py引用"""
     global db_instance
     if db_instance is None:
         # 创建PokemonDB实例，自动初始化所有表
         db_instance = PokemonDB(DB_PATH)
+        # WAL模式下读连接不会被写入阻塞，也不会阻塞写入
+        db_instance.conn.execute("PRAGMA journal_mode = WAL")
         print("数据库初始化完成！")
     else:
         print("数据库已初始化。")
 
+def _py_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+def enable_memory_replica():
+    """
+    开启内存副本服务模式，立即建立并发布副本（API 启动时调用；导入工具不调用，继续读写磁盘文件）
+    建立副本后关闭写连接：服务进程之后只在建立副本时短暂地只读打开磁盘文件，不持有它的WAL，
+    导入工具可以随时用重建好的文件替换它（见 build_database_file）
+    """
+    global _memory_replica_enabled, db_instance
+    if db_instance is None:
+        init_db()
+    _memory_replica_enabled = True
+    publish_memory_replica(build_memory_replica())
+    db_instance.close()
+    db_instance = None
+
+def build_memory_replica():
+    """
+    把磁盘数据库完整复制到一个新的共享缓存内存数据库，返回 MemoryReplica，不发布
+    版本在复制之前取得，复制期间数据变化时副本带着旧版本，下一次检查时会再次刷新
+    """
+    start = time.perf_counter()
+    version = get_data_version()
+    uri = f"file:pokemon_replica_{next(_memory_replica_names)}?mode=memory&cache=shared"
+    # 内存数据库在最后一个连接关闭时释放（见 MemoryReplica）
+    anchor = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    source = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    try:
+        source.backup(anchor)
+    finally:
+        source.close()
+    _memory_replica_stats["builds"] += 1
+    _memory_replica_stats["last_build_duration"] = time.perf_counter() - start
+    print(f"内存副本已建立，用时 {_memory_replica_stats['last_build_duration']:.3f} 秒")
+    return MemoryReplica(uri, version, anchor)
+
+def publish_memory_replica(replica):
+    """发布副本：之后没有固定副本的读取都使用它（旧副本在最后一个使用者切换后释放）"""
+    global _memory_replica
+    _memory_replica = replica
+
+def get_memory_replica():
+    """当前上下文使用的副本（固定的副本，没有固定时为已发布的副本）"""
+    return _pinned_replica.get() or _memory_replica
+
+@contextlib.contextmanager
+def pinned_memory_replica(replica):
+    """
+    with 块内（包括其中 run_db 执行的查询）的读取固定使用 replica，不受发布新副本的影响
+    replica 为 None 时不固定
+    """
+    token = _pinned_replica.set(replica)
+    try:
+        yield
+    finally:
+        _pinned_replica.reset(token)
+
+def get_read_version():
+    """
+    读取到的数据版本，用作读取函数的缓存标签
+    开启内存副本时是当前上下文所读副本的版本（磁盘已变化而新副本尚未发布时仍是旧版本），否则是磁盘数据版本
+    """
+    if _memory_replica_enabled:
+        replica = get_memory_replica()
+        if replica is not None:
+            return replica.version
+    return get_data_version()
+
+def get_memory_replica_stats():
+    """内存副本的状态（是否开启、数据版本、重建次数和耗时）"""
+    replica = _memory_replica
+    return {
+        "enabled": _memory_replica_enabled,
+        "version": replica.version if replica is not None else None,
+        **_memory_replica_stats
+    }
+
+def _database_file_id():
+    """数据库文件的标识 (设备, inode)，文件被整体替换后变化；文件不存在时为 None"""
+    try:
+        st = os.stat(DB_PATH)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+def _open_read_connection(uri, file_id=None):
+    """打开当前线程的只读连接，替换该线程之前的连接"""
+    old = getattr(_read_local, "conn", None)
+    if old is not None:
+        with _read_connections_lock:
+            _read_connections.remove(old)
+        old.close()
+    # check_same_thread=False 只是为了关闭时能统一回收，连接本身只在所属线程内使用
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = ON")
+    # SQLite 内置的 lower() 只处理ASCII，过滤条件使用与 Python 一致的小写转换
+    conn.create_function("py_lower", 1, _py_lower, deterministic=True)
+    _read_local.conn = conn
+    _read_local.uri = uri
+    _read_local.file_id = file_id
+    with _read_connections_lock:
+        _read_connections.append(conn)
+    return conn
+
+def get_read_connection():
+    """
+    获取当前线程的只读数据库连接（首次调用时打开）
+    开启内存副本时连接到当前上下文使用的副本（见 get_memory_replica），副本变化后下一次调用时切换；没有开启时连接磁盘文件，
+    文件被整体替换后下一次调用时重新打开
+    """
+    if db_instance is None and not _memory_replica_enabled:
+        init_db()
+    conn = getattr(_read_local, "conn", None)
+    if _memory_replica_enabled:
+        replica = get_memory_replica()
+        if conn is None or _read_local.uri != replica.uri:
+            # replica 在这里仍被引用，它的内存数据库不会在连接前被释放（否则会连到一个新的空内存数据库）
+            conn = _open_read_connection(replica.uri)
+    else:
+        file_id = _database_file_id()
+        if conn is None or _read_local.file_id != file_id:
+            conn = _open_read_connection(f"file:{DB_PATH}?mode=ro", file_id)
+    return conn
+
+def get_read_executor():
+    """获取只读查询线程池"""
+    global _read_executor
+    if _read_executor is None:
+        _read_executor = ThreadPoolExecutor(max_workers=DB_READ_WORKERS, thread_name_prefix="db-read")
+    return _read_executor
+
+async def run_db(func, *args, **kwargs):
+    """
+    在只读查询线程池中执行同步的数据库函数，供异步接口 await
+    慢查询只占用一个工作线程，不会阻塞事件循环上的其他请求
+    """
+    loop = asyncio.get_running_loop()
+    # 在复制的上下文中执行，当前固定的内存副本随之带入查询线程
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_read_executor(), context.run, functools.partial(func, *args, **kwargs))
+
+# 本进程提交写入的次数：检查点之后WAL文件被原地覆盖，大小不变，修改时间的精度也不足以区分
+# 连续的提交，本进程的写入以这个计数为准，其他进程的写入仍由文件状态判断
+_write_generation = 0
+
+def _data_changed():
+    """本进程提交写入后调用（在 commit 之后，读到新版本号时一定能读到新数据）"""
+    global _write_generation
+    _write_generation += 1
+
+# 数据集内容版本的缓存：(数据集文件状态, 内容版本)，文件状态不变时不重新打开数据集
+_dataset_content = (None, None)
+
+def _dataset_content_version(signature):
+    """数据集记录的内容版本（全部源文件哈希的摘要），只在数据集文件状态变化时重新读取"""
+    global _dataset_content
+    cached_signature, content_version = _dataset_content
+    if cached_signature != signature:
+        try:
+            with Dataset(DATASET_PATH) as dataset:
+                content_version = dataset.version or "unknown"
+        except (sqlite3.Error, ValueError):
+            content_version = "unreadable"
+        _dataset_content = (signature, content_version)
+    return content_version
+
+def get_data_version():
+    """
+    数据版本：由数据库文件（含WAL文件）和数据集文件的 inode/大小/修改时间，以及数据集的内容版本组成
+    任何一方变化（重新导入、重新编译数据集、重建后整体替换文件）都会得到新的版本；
+    数据集内容版本由源文件内容得到，文件状态碰巧相同而内容不同时版本也会变化
+    """
+    version = [str(_write_generation)]
+    # WAL模式下新写入的数据先进入 -wal 文件
+    wal_path = DB_PATH + "-wal"
+    for path in (DB_PATH, wal_path, DATASET_PATH):
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        if path == wal_path and (st is None or st.st_size == 0):
+            # 空的WAL文件（首次打开连接时创建）不代表数据变化
+            version.append("empty")
+        elif st is None:
+            version.append("missing")
+        else:
+            signature = f"{st.st_ino}-{st.st_size}-{st.st_mtime_ns}"
+            version.append(signature)
+            if path == DATASET_PATH:
+                version.append(_dataset_content_version(signature))
+    return ":".join(version)
+
+# 物化的统计信息
+_stats_materializer = None
+
+def load_stats_materializer(force=False, pokemon_list=None):
+    """
+    按数据版本计算统计信息；版本未变化时直接复用
+    :param pokemon_list: 已加载的宝可梦列表，传入时不再重复查询
+    """
+    global _stats_materializer
+    version = get_read_version()
+    if force or _stats_materializer is None or _stats_materializer.version != version:
+        if pokemon_list is None:
+            pokemon_list = get_all_pokemon()
+        _stats_materializer = StatsMaterializer(pokemon_list, get_all_items(), get_all_moves(), version)
+    return _stats_materializer
+
+def get_stats_summary():
+    """获取物化的统计信息"""
+    if _stats_materializer is None:
+        load_stats_materializer()
+    return _stats_materializer.summary()
+
+def _restamp_stats_materializer():
+    """增量更新后记录新的数据版本，避免下一次加载时整体重算"""
+    if _stats_materializer is not None:
+        _stats_materializer.version = get_data_version()
+
+# 列表接口的查询下推：过滤、计数和分页都在 SQLite 中完成，只取回当前页
+# 宝可梦表的字段（形态表补充的宝可梦使用相同字段）
+POKEMON_COLUMNS = ('id',) + FORM_FIELDS
+
+# 图鉴数据源：宝可梦表，加上宝可梦表中没有的编号在形态表中的第一个形态
+POKEMON_SOURCE_SQL = f"""
+    SELECT {', '.join(POKEMON_COLUMNS)} FROM pokemon
+    UNION ALL
+    SELECT base_pokemon_id AS id, {', '.join(FORM_FIELDS)} FROM pokemon_forms f
+    WHERE base_pokemon_id NOT IN (SELECT id FROM pokemon)
+      AND form_key = (SELECT MIN(form_key) FROM pokemon_forms WHERE base_pokemon_id = f.base_pokemon_id)
+"""
+
+# 允许查询去重取值的 (表, 字段)
+DISTINCT_COLUMNS = {('items', 'category'), ('moves', 'type'), ('moves', 'category')}
+
+# 过滤后总数的缓存：按数据版本失效，翻页时不必每页重新 COUNT
+_count_cache = cache_region("list_counts", max_entries=256)
+
+def encode_cursor(last_id):
+    """把上一页最后一条的id编码为不透明的分页游标"""
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """解析分页游标，返回上一页最后一条的id；游标无效时抛出 ValueError"""
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        prefix, last_id = text.split(":", 1)
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(last_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+class ListQuery:
+    """
+    把列表接口的过滤条件转换为参数化SQL
+    子串匹配使用 instr(py_lower(字段), 小写查询)，与 Python 的 `query.lower() in value.lower()` 一致
+    """
+
+    def __init__(self, source):
+        """
+        :param source: 表名或子查询
+        """
+        self.source = source if source.isidentifier() else f"({source})"
+        self.conditions = []
+        self.params = []
+
+    def where(self, condition, *params):
+        """添加一个 AND 条件"""
+        self.conditions.append(condition)
+        self.params.extend(params)
+        return self
+
+    def contains(self, columns, text, id_match=None):
+        """任一字段包含 text（不区分大小写）；id_match 不为 None 时也匹配 id"""
+        clauses = [f"instr(py_lower({column}), ?) > 0" for column in columns]
+        params = [text.lower()] * len(columns)
+        if id_match is not None:
+            clauses.append("id = ?")
+            params.append(id_match)
+        return self.where("(" + " OR ".join(clauses) + ")", *params)
+
+    def _where_sql(self):
+        return " WHERE " + " AND ".join(self.conditions) if self.conditions else ""
+
+    def count(self, cursor):
+        """过滤后的总数（同一数据版本下相同的过滤条件只计算一次）"""
+        where_sql = self._where_sql()
+        def load():
+            cursor.execute(f"SELECT COUNT(*) FROM {self.source}{where_sql}", self.params)
+            return cursor.fetchone()[0]
+        return _count_cache.get_or_load(
+            (self.source, where_sql, tuple(self.params)), load, get_read_version()
+        )
+
+    def fetch(self, cursor, skip=0, limit=50, after_id=None):
+        """
+        按id排序后取 [skip, skip+limit) 的行
+        after_id 不为 None 时从该id之后开始（WHERE id > ?），深分页也只需沿主键读取 skip+limit 行
+        """
+        conditions = list(self.conditions)
+        params = list(self.params)
+        if after_id is not None:
+            conditions.append("id > ?")
+            params.append(after_id)
+        where_sql = " WHERE " + " AND ".join(conditions) if conditions else ""
+        cursor.execute(
+            f"SELECT * FROM {self.source}{where_sql} ORDER BY id LIMIT ? OFFSET ?",
+            params + [limit, skip]
+        )
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def page(self, cursor, skip=0, limit=50, after_id=None, with_total=True):
+        """
+        返回 (当前页数据, 过滤后总数, 下一页的 after_id)
+        多取一行判断是否还有下一页，没有时下一页的 after_id 为 None
+        with_total 为 False 时不执行 COUNT(*)，总数为 None（游标分页只需要下一页的 after_id）
+        """
+        rows = self.fetch(cursor, skip, limit + 1, after_id)
+        next_after_id = rows[limit - 1]['id'] if len(rows) > limit else None
+        total = self.count(cursor) if with_total else None
+        return rows[:limit], total, next_after_id
+
+# 读取函数的结果按数据版本缓存在各自的区域中（见 cache.py），数据文件变化后自动失效
+# query_pokemon 和宝可梦详情的查询不在这里缓存：接口按同样的键和数据版本缓存序列化后的响应（见 main.py），
+# 再缓存一份字典只会多占内存，不会多命中
+def query_pokemon(skip=0, limit=50, type_filter=None, search=None, generation=None, after_id=None,
+                  gender=None, with_total=True):
+    """
+    宝可梦列表：属性、名称/序号搜索、世代和性别过滤
+    返回 (当前页宝可梦列表, 过滤后总数, 下一页的 after_id)
+    结果与 get_all_pokemon() 上逐条过滤再切片一致
+    :param gender: GENDER_FILTERS 中的值（mixed），其他值不过滤
+    :param with_total: 为 False 时不统计总数（返回 None）
+    """
+    query = ListQuery(POKEMON_SOURCE_SQL)
+    if generation in GEN_RANGES:
+        query.where("id BETWEEN ? AND ?", *GEN_RANGES[generation])
+    if gender in GENDER_FILTERS:
+        query.where(GENDER_FILTERS[gender])
+    if search:
+        query.contains(('name', 'en_name', 'jp_name'), search,
+                       id_match=int(search) if search.isdigit() else None)
+    if type_filter:
+        query.contains(('type1', 'type2'), type_filter)
+    cursor = get_read_connection().cursor()
+    pokemon_list, total, next_after_id = query.page(cursor, skip, limit, after_id, with_total)
+    return [with_gender_ratio(p) for p in pokemon_list], total, next_after_id
+
+@cached("move_pages", get_read_version, max_entries=256)
+def query_moves(skip=0, limit=50, type_filter=None, category_filter=None, search=None, after_id=None):
+    """技能列表：名称搜索、属性和类别过滤，返回 (当前页技能列表, 过滤后总数, 下一页的 after_id)"""
+    query = ListQuery("moves")
+    if search:
+        query.contains(('name',), search)
+    if type_filter:
+        query.contains(('type',), type_filter)
+    if category_filter:
+        query.contains(('category',), category_filter)
+    return query.page(get_read_connection().cursor(), skip, limit, after_id)
+
+@cached("item_pages", get_read_version, max_entries=256)
+def query_items(skip=0, limit=50, category_filter=None, search=None, after_id=None):
+    """物品列表：中英文名称搜索和类别过滤，返回 (当前页物品列表, 过滤后总数, 下一页的 after_id)"""
+    query = ListQuery("items")
+    if search:
+        query.contains(('name', 'english'), search)
+    if category_filter:
+        query.contains(('category',), category_filter)
+    return query.page(get_read_connection().cursor(), skip, limit, after_id)
+
+@cached("distinct_values", get_read_version, max_entries=16)
+def get_distinct_values(table, column):
+    """字段的去重取值（排除空值，已排序），用于过滤选项"""
+    if (table, column) not in DISTINCT_COLUMNS:
+        raise ValueError(f"不支持的去重字段: {table}.{column}")
+    cursor = get_read_connection().cursor()
+    cursor.execute(
+        f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL AND {column} != '' ORDER BY {column}"
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+@cached("search", get_read_version, max_entries=1024)
+def search_all(q, skip=0, limit=20, source=None):
+    """
+    宝可梦、技能、物品的全文搜索，按相关度排序（越小越相关）后分页
+    查询词都不短于3个字符时使用 FTS5 索引，否则退回子串扫描
+    :param source: 只搜索某个数据源（pokemon/moves/items），为 None 时搜索全部
+    :return: (当前页结果列表, 总数)，结果依次包含 source、id、title、snippet（已转义的HTML）、score
+    """
+    if source is not None and source not in SEARCH_SOURCES:
+        raise ValueError(f"不支持的搜索范围: {source}")
+    sources = [source] if source else list(SEARCH_SOURCES)
+    terms = split_terms(q)
+    if not terms:
+        return [], 0
+
+    match = build_match_query(terms)
+    if match is not None:
+        union_sql = " UNION ALL ".join(match_sql(s) for s in sources)
+        params = [match] * len(sources)
+    else:
+        queries = [scan_query(s, terms) for s in sources]
+        union_sql = " UNION ALL ".join(sql for sql, _ in queries)
+        params = [param for _, query_params in queries for param in query_params]
+
+    cursor = get_read_connection().cursor()
+    cursor.execute(
+        f"SELECT * FROM ({union_sql}) ORDER BY score, source, id LIMIT ? OFFSET ?",
+        params + [limit, skip]
+    )
+    columns = [desc[0] for desc in cursor.description]
+    results = []
+    for row in cursor.fetchall():
+        row = dict(zip(columns, row))
+        if match is None:
+            # 子串扫描没有 snippet()，按返回的索引字段生成相同格式的摘要
+            row['snippet'] = make_snippet(json.loads(row['fields']), terms)
+        else:
+            row['snippet'] = mark_snippet(row['snippet'])
+        results.append({field: row[field] for field in SEARCH_RESULT_FIELDS})
+
+    def load_total():
+        cursor.execute(f"SELECT COUNT(*) FROM ({union_sql})", params)
+        return cursor.fetchone()[0]
+    total = _count_cache.get_or_load(("search", union_sql, tuple(params)), load_total, get_read_version())
+    return results, total
+
+# 写入语句：单条插入和批量插入共用
+INSERT_POKEMON_SQL = """
+INSERT OR REPLACE INTO pokemon
+(id, name, jp_name, en_name, type1, type2, hp, attack, defense, sp_atk, sp_def, speed, total, height, weight,
+ male_ratio, female_ratio, description, image_path)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_MOVE_SQL = """
+INSERT OR IGNORE INTO moves
+(id, name, type, category, power, accuracy, pp, "desc", shortDesc)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_ITEM_SQL = """
+INSERT OR IGNORE INTO items
+(id, name, english, category, num, spritenum, desc, shortDesc, gen, isPokeball)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_POKEMON_MOVE_SQL = f"""
+INSERT OR IGNORE INTO pokemon_moves
+({', '.join(POKEMON_MOVE_COLUMNS)})
+VALUES ({', '.join('?' for _ in POKEMON_MOVE_COLUMNS)})
+"""
+
+INSERT_EVOLUTION_SQL = f"""
+INSERT OR REPLACE INTO evolutions
+({', '.join(EVOLUTION_COLUMNS)})
+VALUES ({', '.join('?' for _ in EVOLUTION_COLUMNS)})
+"""
+
+def _pokemon_params(pokemon_data):
+    return (
+        pokemon_data["id"], pokemon_data["name"], pokemon_data.get("jp_name"),
+        pokemon_data.get("en_name"), pokemon_data["type1"], pokemon_data.get("type2"),
+        pokemon_data["hp"], pokemon_data["attack"], pokemon_data["defense"],
+        pokemon_data["sp_atk"], pokemon_data["sp_def"], pokemon_data["speed"],
+        pokemon_data["total"], pokemon_data.get("height"), pokemon_data.get("weight")
+    ) + gender_columns(pokemon_data.get("gender_ratio")) + (
+        pokemon_data.get("description"), pokemon_data.get("image_path")
+    )
+
+def _move_params(move_data):
+    return (
+        move_data["id"], move_data["name"], move_data.get("type"),
+        move_data.get("category"), move_data.get("power"),
+        move_data.get("accuracy"), move_data.get("pp"),
+        move_data.get("desc"), move_data.get("shortDesc")
+    )
+
+def _item_params(item_data):
+    return (
+        item_data["id"], item_data["name"], item_data.get("english"),
+        item_data.get("category"), item_data.get("num"),
+        item_data.get("spritenum"), item_data.get("desc"),
+        item_data.get("shortDesc"), item_data.get("gen"),
+        item_data.get("isPokeball")
+    )
+
 def insert_pokemon(pokemon_data):
     """插入宝可梦信息，引用pokemon_db_init.py中的方法"""
     if db_instance is None:
@@ -31,28 +599,45 @@ def insert_pokemon(pokemon_data):
     # 使用PokemonDB实例的数据库连接
     try:
         cursor = db_instance.conn.cursor()
-        # 将gender_ratio转换为JSON字符串
-        gender_ratio = pokemon_data.get("gender_ratio")
-        gender_ratio_json = json.dumps(gender_ratio) if gender_ratio is not None else None
 
-        sql = """
-        INSERT OR REPLACE INTO pokemon
-        (id, name, jp_name, en_name, type1, type2, hp, attack, defense, sp_atk, sp_def, speed, total, height, weight, gender_ratio, description, image_path)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        cursor.execute(sql, (
-            pokemon_data["id"], pokemon_data["name"], pokemon_data.get("jp_name"),
-            pokemon_data.get("en_name"), pokemon_data["type1"], pokemon_data.get("type2"),
-            pokemon_data["hp"], pokemon_data["attack"], pokemon_data["defense"],
-            pokemon_data["sp_atk"], pokemon_data["sp_def"], pokemon_data["speed"],
-            pokemon_data["total"], pokemon_data.get("height"), pokemon_data.get("weight"),
-            gender_ratio_json, pokemon_data.get("description"), pokemon_data.get("image_path")
-        ))
+        # INSERT OR REPLACE 会覆盖相同id或名称的旧行，统计信息需要先减去旧行
+        replaced_rows = []
+        if _stats_materializer is not None:
+            cursor.execute(
+                "SELECT type1, type2, total, hp, attack FROM pokemon WHERE id = ? OR name = ?",
+                (pokemon_data["id"], pokemon_data["name"])
+            )
+            columns = [desc[0] for desc in cursor.description]
+            replaced_rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        cursor.execute(INSERT_POKEMON_SQL, _pokemon_params(pokemon_data))
         db_instance.conn.commit()
+        _data_changed()
+        if _stats_materializer is not None:
+            for row in replaced_rows:
+                _stats_materializer.remove_pokemon(row)
+            _stats_materializer.add_pokemon(pokemon_data)
+            _restamp_stats_materializer()
         print(f"成功插入宝可梦: {pokemon_data['name']}")
     except Exception as e:
         print(f"插入宝可梦失败: {e}")
 
+def insert_pokemon_form(form_row):
+    """
+    插入或更新宝可梦形态（pokemon_forms 表）
+    :param form_row: pokemon_forms.load_forms() 返回的行
+    """
+    if db_instance is None:
+        init_db()
+
+    try:
+        cursor = db_instance.conn.cursor()
+        cursor.execute(INSERT_FORM_SQL, form_row_values(form_row))
+        db_instance.conn.commit()
+        _data_changed()
+    except Exception as e:
+        print(f"插入宝可梦形态失败 {form_row.get('form_key')}: {e}")
+
 def insert_move(move_data):
     """插入技能信息"""
     if db_instance is None:
@@ -60,124 +645,254 @@ def insert_move(move_data):
 
     try:
         cursor = db_instance.conn.cursor()
-        sql = """
-        INSERT OR IGNORE INTO moves
-        (id, name, type, category, power, accuracy, pp)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
-        cursor.execute(sql, (
-            move_data["id"], move_data["name"], move_data.get("type"),
-            move_data.get("category"), move_data.get("power"),
-            move_data.get("accuracy"), move_data.get("pp")
-        ))
+        cursor.execute(INSERT_MOVE_SQL, _move_params(move_data))
+        inserted = cursor.rowcount > 0  # INSERT OR IGNORE 忽略时 rowcount 为 0
         db_instance.conn.commit()
+        _data_changed()
+        if inserted and _stats_materializer is not None:
+            _stats_materializer.add_move(move_data)
+            _restamp_stats_materializer()
         print(f"成功插入技能: {move_data['name']}")
     except Exception as e:
         print(f"插入技能失败: {e}")
 
-def insert_pokemon_move(pokemon_id, move_id, level_learned):
-    """插入宝可梦-技能关联"""
+def _pokemon_move_params(pokemon_move):
+    return tuple(pokemon_move.get(column) for column in POKEMON_MOVE_COLUMNS)
+
+def insert_pokemon_move(pokemon_id, move_id, level_learned, method='level_up'):
+    """插入宝可梦-技能关联（method 为 learnsets.LEARN_METHODS 中的学习方式）"""
     if db_instance is None:
         init_db()
 
     try:
         cursor = db_instance.conn.cursor()
-        sql = """
-        INSERT OR IGNORE INTO pokemon_moves
-        (pokemon_id, move_id, level_learned)
-        VALUES (?, ?, ?)
-        """
-        cursor.execute(sql, (pokemon_id, move_id, level_learned))
+        cursor.execute(INSERT_POKEMON_MOVE_SQL, (pokemon_id, move_id, method, level_learned))
         db_instance.conn.commit()
+        _data_changed()
         print(f"成功关联宝可梦 {pokemon_id} 和技能 {move_id}")
     except Exception as e:
         print(f"关联宝可梦和技能失败: {e}")
 
-def insert_evolution(base_pokemon_id, evolved_pokemon_id, condition):
-    """插入进化信息"""
+def _evolution_params(evolution):
+    return tuple(evolution.get(column) for column in EVOLUTION_COLUMNS)
+
+def insert_evolution(base_pokemon_id, evolved_pokemon_id, condition, evo_type=None, evo_level=None, evo_item=None):
+    """插入或更新进化信息（同一对宝可梦只保存一条）"""
     if db_instance is None:
         init_db()
 
     try:
         cursor = db_instance.conn.cursor()
-        sql = """
-        INSERT OR IGNORE INTO evolutions
-        (base_pokemon_id, evolved_pokemon_id, condition)
-        VALUES (?, ?, ?)
-        """
-        cursor.execute(sql, (base_pokemon_id, evolved_pokemon_id, condition))
+        cursor.execute(INSERT_EVOLUTION_SQL, (
+            base_pokemon_id, evolved_pokemon_id, condition, evo_type, evo_level, evo_item
+        ))
         db_instance.conn.commit()
+        _data_changed()
         print(f"成功插入进化: {base_pokemon_id} -> {evolved_pokemon_id}")
     except Exception as e:
         print(f"插入进化失败: {e}")
 
-def get_pokemon_by_id(pokemon_id):
-    """根据ID查询宝可梦信息，包括所有变种形态"""
+# 批量写入：一个事务内按批次 executemany，导入期间临时调整 pragma
+BULK_BATCH_SIZE = 500
+BULK_PRAGMAS = {
+    "synchronous": "NORMAL",   # WAL模式下只在检查点时fsync
+    "temp_store": "MEMORY",
+    "cache_size": -65536       # 64MB 页缓存
+}
+
+def _bulk_insert(label, sql, rows, to_params, batch_size=BULK_BATCH_SIZE, pragmas=None):
+    """
+    在一个事务中批量执行写入语句，出错时整体回滚
+    :param rows: 可迭代的数据行，按 batch_size 分批转换为参数后 executemany
+    :param pragmas: 覆盖 BULK_PRAGMAS 的设置，写入结束后恢复原值
+    :return: 处理的行数
+    """
+    global _stats_materializer
     if db_instance is None:
         init_db()
+    conn = db_instance.conn
 
+    settings = dict(BULK_PRAGMAS)
+    settings.update(pragmas or {})
+    previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in settings}
+    for name, value in settings.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+    start = time.perf_counter()
+    total = 0
+    rows = iter(rows)
     try:
-        cursor = db_instance.conn.cursor()
-        cursor.execute("SELECT * FROM pokemon WHERE id = ?", (pokemon_id,))
+        conn.execute("BEGIN")
+        while True:
+            batch = [to_params(row) for row in itertools.islice(rows, batch_size)]
+            if not batch:
+                break
+            conn.executemany(sql, batch)
+            total += len(batch)
+        conn.commit()
+        _data_changed()
+    except Exception as e:
+        conn.rollback()
+        print(f"批量插入{label}失败（已回滚）: {e}")
+        raise
+    finally:
+        for name, value in previous.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else float("inf")
+    print(f"批量插入{label}: {total} 行，用时 {elapsed:.3f} 秒，{rate:.0f} 行/秒")
+    # 批量写入后统计信息整体失效，下次访问时重新计算
+    _stats_materializer = None
+    return total
+
+def insert_pokemon_bulk(pokemon_rows, batch_size=BULK_BATCH_SIZE, pragmas=None):
+    """批量插入宝可梦（与 insert_pokemon 相同，id或名称相同的旧行会被覆盖）"""
+    return _bulk_insert("宝可梦", INSERT_POKEMON_SQL, pokemon_rows, _pokemon_params, batch_size, pragmas)
+
+def insert_pokemon_forms_bulk(form_rows, batch_size=BULK_BATCH_SIZE, pragmas=None):
+    """批量插入或更新宝可梦形态，form_rows 为 pokemon_forms.load_forms() 返回的行"""
+    return _bulk_insert("宝可梦形态", INSERT_FORM_SQL, form_rows, form_row_values, batch_size, pragmas)
+
+def insert_moves_bulk(moves, batch_size=BULK_BATCH_SIZE, pragmas=None):
+    """批量插入技能（已存在的id或名称会被忽略）"""
+    return _bulk_insert("技能", INSERT_MOVE_SQL, moves, _move_params, batch_size, pragmas)
+
+def insert_items_bulk(items, batch_size=BULK_BATCH_SIZE, pragmas=None):
+    """批量插入物品（已存在的id或名称会被忽略）"""
+    return _bulk_insert("物品", INSERT_ITEM_SQL, items, _item_params, batch_size, pragmas)
+
+def insert_pokemon_moves_bulk(pokemon_moves, batch_size=BULK_BATCH_SIZE, pragmas=None):
+    """批量插入宝可梦-技能关联，pokemon_moves 为 learnsets.learnset_rows() 返回的行"""
+    return _bulk_insert(
+        "宝可梦-技能关联", INSERT_POKEMON_MOVE_SQL, pokemon_moves, _pokemon_move_params, batch_size, pragmas
+    )
+
+def insert_evolutions_bulk(evolutions, batch_size=BULK_BATCH_SIZE, pragmas=None):
+    """批量插入或更新进化信息，evolutions 为 evolution_graph.load_evolution_edges() 返回的行"""
+    return _bulk_insert("进化", INSERT_EVOLUTION_SQL, evolutions, _evolution_params, batch_size, pragmas)
+
+# 增量导入时按键整体替换的表：表名 -> (键字段, 写入语句, 参数函数, 引用该表的 [(表, 字段), ...])
+# 键对应的旧行先全部删除再写入新行；没有新行的键（源文件已删除）同时删除引用它的行
+DELTA_TABLES = {
+    'pokemon': ('id', INSERT_POKEMON_SQL, _pokemon_params, [
+        ('pokemon_moves', 'pokemon_id'), ('evolutions', 'base_pokemon_id'), ('evolutions', 'evolved_pokemon_id')
+    ]),
+    'pokemon_forms': ('base_pokemon_id', INSERT_FORM_SQL, form_row_values, []),
+    'moves': ('id', INSERT_MOVE_SQL, _move_params, [('pokemon_moves', 'move_id')]),
+    'items': ('id', INSERT_ITEM_SQL, _item_params, []),
+    'pokemon_moves': ('pokemon_id', INSERT_POKEMON_MOVE_SQL, _pokemon_move_params, []),
+}
+
+def get_ingest_manifest():
+    """导入清单：{相对路径: (数据源, 键, 大小, 修改时间纳秒, 哈希)}"""
+    if db_instance is None:
+        init_db()
+    rows = db_instance.conn.execute(
+        "SELECT path, source, record_key, size, mtime_ns, hash FROM ingest_manifest"
+    ).fetchall()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+def get_move_id_map():
+    """导入用：Showdown 技能id -> moves.id（见 learnsets.build_move_id_map）"""
+    if db_instance is None:
+        init_db()
+    return build_move_id_map(db_instance.conn)
+
+def get_pokemon_ids():
+    """导入用：pokemon 表中的全部编号"""
+    if db_instance is None:
+        init_db()
+    return {row[0] for row in db_instance.conn.execute("SELECT id FROM pokemon")}
+
+def replace_ingest_manifest(entries):
+    """全量导入后用全部源文件的清单行（ingest_manifest.manifest_entry 的结果）替换导入清单"""
+    if db_instance is None:
+        init_db()
+    conn = db_instance.conn
+    try:
+        conn.execute("BEGIN")
+        conn.execute("DELETE FROM ingest_manifest")
+        conn.executemany(UPSERT_MANIFEST_SQL, entries)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"写入导入清单失败（已回滚）: {e}")
+        raise
+    print(f"导入清单: {len(entries)} 个源文件")
+
+def apply_ingest_delta(changes, evolutions=None, manifest_entries=(), removed_paths=()):
+    """
+    在一个事务中应用增量导入：替换变化的键对应的行，并更新导入清单
+    :param changes: {DELTA_TABLES 中的表名: (需要替换的键, 新的数据行)}，按字典顺序写入；
+                    数据行也可以是接收连接对象、返回数据行的函数，在前面的表写入后调用（用于依赖这些表的行）
+    :param evolutions: 不为 None 时整体替换 evolutions 表（load_evolution_edges() 的结果）
+    :param manifest_entries: 新增或更新的清单行
+    :param removed_paths: 已删除的源文件的相对路径
+    :return: {表名: (写入行数, 删除的键数)}
+    """
+    global _stats_materializer
+    if db_instance is None:
+        init_db()
+    conn = db_instance.conn
+
+    start = time.perf_counter()
+    counts = {}
+    try:
+        conn.execute("BEGIN")
+        # 键先删除再写入，期间引用这些键的行暂时悬空，外键约束推迟到提交时检查
+        conn.execute("PRAGMA defer_foreign_keys = ON")
+        for table, (keys, rows) in changes.items():
+            key_column, sql, to_params, references = DELTA_TABLES[table]
+            rows = list(rows(conn) if callable(rows) else rows)
+            params = [to_params(row) for row in rows]
+            remaining = {row[key_column] for row in rows}
+            removed = [(key,) for key in keys if key not in remaining]
+            for ref_table, ref_column in references:
+                conn.executemany(f"DELETE FROM {ref_table} WHERE {ref_column} = ?", removed)
+            conn.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", [(key,) for key in keys])
+            conn.executemany(sql, params)
+            counts[table] = (len(params), len(removed))
+        if evolutions is not None:
+            # 只写入两端都在 pokemon 表中的进化关系（校验失败未导入的宝可梦不会破坏外键约束）
+            existing = {row[0] for row in conn.execute("SELECT id FROM pokemon")}
+            params = [
+                _evolution_params(edge) for edge in evolutions
+                if edge['base_pokemon_id'] in existing and edge['evolved_pokemon_id'] in existing
+            ]
+            conn.execute("DELETE FROM evolutions")
+            conn.executemany(INSERT_EVOLUTION_SQL, params)
+            counts['evolutions'] = (len(params), 0)
+        conn.executemany(UPSERT_MANIFEST_SQL, manifest_entries)
+        conn.executemany(DELETE_MANIFEST_SQL, [(path,) for path in removed_paths])
+        conn.commit()
+        _data_changed()
+    except Exception as e:
+        conn.rollback()
+        print(f"增量导入失败（已回滚）: {e}")
+        raise
+
+    elapsed = time.perf_counter() - start
+    for table, (written, removed) in counts.items():
+        print(f"增量导入{table}: 写入 {written} 行，删除 {removed} 个键")
+    print(f"增量导入完成，用时 {elapsed:.3f} 秒")
+    _stats_materializer = None
+    return counts
+
+def get_pokemon_by_id(pokemon_id):
+    """根据ID查询宝可梦信息，包括所有变种形态"""
+    try:
+        cursor = get_read_connection().cursor()
+        cursor.execute(f"SELECT {', '.join(POKEMON_COLUMNS)} FROM pokemon WHERE id = ?", (pokemon_id,))
         row = cursor.fetchone()
         if row:
             columns = [desc[0] for desc in cursor.description]
-            pokemon_data = dict(zip(columns, row))
-            # 将gender_ratio从JSON字符串解析为对象
-            if pokemon_data.get('gender_ratio') is not None:
-                try:
-                    pokemon_data['gender_ratio'] = json.loads(pokemon_data['gender_ratio'])
-                except:
-                    pokemon_data['gender_ratio'] = {}
-            else:
-                pokemon_data['gender_ratio'] = {}
-            
-            # 从pokemon_data_all目录中读取该宝可梦的所有变种形态
-            data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend/spider/pokemon_data_all")
-            variants = []
-            if os.path.exists(data_dir):
-                for filename in os.listdir(data_dir):
-                    if filename.endswith('.json'):
-                        try:
-                            # 解析文件名获取id
-                            parts = filename[:-5].split('_')  # 移除.json后缀
-                            if len(parts) >= 1:
-                                file_id = int(parts[0])
-                                if file_id == pokemon_id:
-                                    # 检查是否为Mega或Gmax形态
-                                    name_part = filename[len(f"{pokemon_id}_"):-5]  # 移除id_前缀和.json后缀
-                                    if 'mega' in name_part.lower() or 'gmax' in name_part.lower():
-                                        continue  # 跳过Mega和Gmax形态，它们应该出现在mega_gmax_forms中
-                                    
-                                    # 读取变种数据
-                                    with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
-                                        form_data = json.load(f)
-                                    
-                                    # 构建变种宝可梦数据
-                                    variant_pokemon = {
-                                        'id': pokemon_id,
-                                        'name': form_data.get('name', ''),
-                                        'jp_name': form_data.get('jp_name'),
-                                        'en_name': form_data.get('en_name'),
-                                        'type1': form_data.get('type1', 'Normal'),
-                                        'type2': form_data.get('type2'),
-                                        'hp': form_data.get('hp'),
-                                        'attack': form_data.get('attack'),
-                                        'defense': form_data.get('defense'),
-                                        'sp_atk': form_data.get('sp_atk'),
-                                        'sp_def': form_data.get('sp_def'),
-                                        'speed': form_data.get('speed'),
-                                        'total': form_data.get('total', 0),
-                                        'height': form_data.get('height'),
-                                        'weight': form_data.get('weight'),
-                                        'gender_ratio': form_data.get('gender_ratio'),
-                                        'description': form_data.get('description'),
-                                        'image_path': form_data.get('image_path')
-                                    }
-                                    variants.append(variant_pokemon)
-                        except Exception as e:
-                            print(f"处理变种宝可梦数据失败 {filename}: {e}")
+            # 雌雄比例字段合并为 gender_ratio
+            pokemon_data = with_gender_ratio(dict(zip(columns, row)), missing={})
             
+            # 从形态表中获取该宝可梦的所有变种形态（不含Mega和Gmax）
+            variants = get_pokemon_variants(pokemon_id)
+
             # 将变种形态添加到宝可梦数据中
             pokemon_data['variants'] = variants
             return pokemon_data
@@ -186,142 +901,78 @@ def get_pokemon_by_id(pokemon_id):
         print(f"查询宝可梦失败: {e}")
         return None
 
-# 缓存变种宝可梦数据
-_variant_pokemon_cache = None
-_cache_timestamp = 0
-CACHE_DURATION = 3600  # 缓存1小时
+_MEGA_GMAX_PLACEHOLDERS = ", ".join("?" for _ in MEGA_GMAX_KINDS)
 
-def get_all_pokemon():
-    """获取所有宝可梦信息，包括变种形态"""
-    global _variant_pokemon_cache, _cache_timestamp
-    import time
-    
-    if db_instance is None:
-        init_db()
+def _fetch_forms(cursor, sql, params):
+    cursor.execute(sql, params)
+    columns = [desc[0] for desc in cursor.description]
+    return [form_row_to_pokemon(dict(zip(columns, row))) for row in cursor.fetchall()]
+
+def get_pokemon_variants(pokemon_id):
+    """获取宝可梦的变种形态（含基础形态，不含Mega和Gmax），按形态标识排序"""
+    cursor = get_read_connection().cursor()
+    return _fetch_forms(cursor, f"""
+        SELECT * FROM pokemon_forms
+        WHERE base_pokemon_id = ? AND kind NOT IN ({_MEGA_GMAX_PLACEHOLDERS})
+        ORDER BY form_key
+    """, (pokemon_id, *MEGA_GMAX_KINDS))
 
+def get_mega_gmax_form_names(pokemon_id):
+    """获取宝可梦的Mega和Gmax形态标识（如 charizardmegax），按形态标识排序"""
     try:
-        cursor = db_instance.conn.cursor()
-        cursor.execute("SELECT * FROM pokemon ORDER BY id")
-        rows = cursor.fetchall()
+        cursor = get_read_connection().cursor()
+        cursor.execute(f"""
+            SELECT form_key FROM pokemon_forms
+            WHERE base_pokemon_id = ? AND kind IN ({_MEGA_GMAX_PLACEHOLDERS})
+            ORDER BY form_key
+        """, (pokemon_id, *MEGA_GMAX_KINDS))
+        return [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"查询Mega和Gmax形态失败: {e}")
+        return []
+
+@cached("all_pokemon", get_read_version, max_entries=1)
+def get_all_pokemon():
+    """获取所有宝可梦信息，包括宝可梦表中没有、只在形态表中出现的编号，按编号排序"""
+    try:
+        cursor = get_read_connection().cursor()
+        cursor.execute(f"SELECT * FROM ({POKEMON_SOURCE_SQL}) ORDER BY id")
         columns = [desc[0] for desc in cursor.description]
-        pokemon_list = []
-        for row in rows:
-            pokemon_data = dict(zip(columns, row))
-            # 将gender_ratio从JSON字符串解析为对象
-            if pokemon_data.get('gender_ratio'):
-                try:
-                    pokemon_data['gender_ratio'] = json.loads(pokemon_data['gender_ratio'])
-                except:
-                    pokemon_data['gender_ratio'] = {}
-            pokemon_list.append(pokemon_data)
-
-        # 检查缓存是否有效
-        current_time = time.time()
-        if _variant_pokemon_cache is None or current_time - _cache_timestamp > CACHE_DURATION:
-            # 从pokemon_data_all目录中读取变种形态的数据
-            data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend/spider/pokemon_data_all")
-            variant_pokemon_list = []
-            if os.path.exists(data_dir):
-                variant_count = 0
-                for filename in os.listdir(data_dir):
-                    if filename.endswith('.json'):
-                        try:
-                            # 解析文件名获取id和名称
-                            parts = filename[:-5].split('_')  # 移除.json后缀
-                            if len(parts) >= 2:
-                                pokemon_id = int(parts[0])
-                                form_name = '_'.join(parts[1:])
-                                
-                                # 读取变种数据
-                                with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
-                                    form_data = json.load(f)
-                                
-                                # 构建变种宝可梦数据
-                                variant_pokemon = {
-                                    'id': pokemon_id,
-                                    'name': form_data.get('name', ''),
-                                    'jp_name': form_data.get('jp_name'),
-                                    'en_name': form_data.get('en_name'),
-                                    'type1': form_data.get('type1', 'Normal'),
-                                    'type2': form_data.get('type2'),
-                                    'hp': form_data.get('hp'),
-                                    'attack': form_data.get('attack'),
-                                    'defense': form_data.get('defense'),
-                                    'sp_atk': form_data.get('sp_atk'),
-                                    'sp_def': form_data.get('sp_def'),
-                                    'speed': form_data.get('speed'),
-                                    'total': form_data.get('total', 0),
-                                    'height': form_data.get('height'),
-                                    'weight': form_data.get('weight'),
-                                    'gender_ratio': form_data.get('gender_ratio'),
-                                    'description': form_data.get('description'),
-                                    'image_path': form_data.get('image_path')
-                                }
-                                
-                                variant_pokemon_list.append(variant_pokemon)
-                                variant_count += 1
-                                if variant_count <= 10:  # 只显示前10个变种宝可梦
-                                    print(f"添加变种宝可梦: {variant_pokemon['name']} (#{variant_pokemon['id']})")
-                        except Exception as e:
-                            print(f"处理变种宝可梦数据失败 {filename}: {e}")
-                print(f"总共添加了 {variant_count} 个变种宝可梦")
-                print(f"宝可梦总数: {len(pokemon_list) + len(variant_pokemon_list)}")
-            
-            # 更新缓存
-            _variant_pokemon_cache = variant_pokemon_list
-            _cache_timestamp = current_time
-        else:
-            print("使用缓存的变种宝可梦数据")
-        
-        # 合并基础宝可梦和变种宝可梦，并去重
-        all_pokemon = []
-        seen_ids = set()  # 用于跟踪已添加的宝可梦ID
-        
-        # 先添加基础宝可梦
-        for pokemon in pokemon_list:
-            all_pokemon.append(pokemon)
-            seen_ids.add(pokemon['id'])
-        
-        # 添加变种宝可梦（只添加ID未出现过的）
-        for pokemon in _variant_pokemon_cache:
-            if pokemon['id'] not in seen_ids:
-                all_pokemon.append(pokemon)
-                seen_ids.add(pokemon['id'])
-        
-        return all_pokemon
+        return [with_gender_ratio(dict(zip(columns, row))) for row in cursor.fetchall()]
     except Exception as e:
         print(f"查询所有宝可梦失败: {e}")
         return []
 
+@cached("pokemon_moves", get_read_version, max_entries=1024)
 def get_pokemon_moves(pokemon_id):
-    """获取宝可梦的技能列表"""
-    if db_instance is None:
-        init_db()
-
+    """
+    获取宝可梦可以学会的技能，按学习方式分组：{学习方式: [技能, ...]}，学习方式按 LEARN_METHODS 的顺序，
+    组内按等级和名称排序（一次按主键前缀 pokemon_id 的查询）
+    """
+    learnset = {method: [] for method, _ in LEARN_METHODS}
     try:
-        cursor = db_instance.conn.cursor()
+        cursor = get_read_connection().cursor()
         sql = """
-        SELECT m.*, pm.level_learned
-        FROM moves m
-        JOIN pokemon_moves pm ON m.id = pm.move_id
+        SELECT pm.method, pm.level_learned, m.id, m.name, m.type, m.category, m.power, m.accuracy, m.pp, m.shortDesc
+        FROM pokemon_moves pm
+        JOIN moves m ON m.id = pm.move_id
         WHERE pm.pokemon_id = ?
-        ORDER BY pm.level_learned
+        ORDER BY pm.method, pm.level_learned, m.name
         """
         cursor.execute(sql, (pokemon_id,))
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        return [dict(zip(columns, row)) for row in rows]
+        columns = [desc[0] for desc in cursor.description][1:]
+        for row in cursor.fetchall():
+            learnset.setdefault(row[0], []).append(dict(zip(columns, row[1:])))
+        return learnset
     except Exception as e:
         print(f"查询宝可梦技能失败: {e}")
-        return []
+        return learnset
 
+@cached("moves", get_read_version, max_entries=1024)
 def get_move_by_id(move_id):
     """根据ID查询技能信息"""
-    if db_instance is None:
-        init_db()
-
     try:
-        cursor = db_instance.conn.cursor()
+        cursor = get_read_connection().cursor()
         cursor.execute("SELECT * FROM moves WHERE id = ?", (move_id,))
         row = cursor.fetchone()
         if row:
@@ -332,13 +983,11 @@ def get_move_by_id(move_id):
         print(f"查询技能失败: {e}")
         return None
 
+@cached("all_moves", get_read_version, max_entries=1)
 def get_all_moves():
     """获取所有技能信息"""
-    if db_instance is None:
-        init_db()
-
     try:
-        cursor = db_instance.conn.cursor()
+        cursor = get_read_connection().cursor()
         cursor.execute("SELECT * FROM moves ORDER BY id")
         rows = cursor.fetchall()
         columns = [desc[0] for desc in cursor.description]
@@ -347,13 +996,11 @@ def get_all_moves():
         print(f"查询所有技能失败: {e}")
         return []
 
+@cached("evolutions", get_read_version, max_entries=1024)
 def get_evolutions(pokemon_id):
     """获取宝可梦的进化信息"""
-    if db_instance is None:
-        init_db()
-
     try:
-        cursor = db_instance.conn.cursor()
+        cursor = get_read_connection().cursor()
         sql = """
         SELECT p.name as evolved_name, e.condition
         FROM evolutions e
@@ -368,6 +1015,55 @@ def get_evolutions(pokemon_id):
         print(f"查询进化信息失败: {e}")
         return []
 
+# 进化家族的最大深度（防止数据异常形成环时无限递归）
+MAX_EVOLUTION_DEPTH = 10
+
+# 先沿 进化后 -> 进化前 找到家族的基础形态，再从基础形态向下展开全部分支；
+# path 是从基础形态开始的零填充编号路径，按它排序即为深度优先顺序（同一层按编号）
+EVOLUTION_FAMILY_SQL = f"""
+WITH RECURSIVE
+ancestors(id, depth) AS (
+    SELECT ?, 0
+    UNION
+    SELECT e.base_pokemon_id, a.depth + 1
+    FROM evolutions e JOIN ancestors a ON e.evolved_pokemon_id = a.id
+    WHERE a.depth < {MAX_EVOLUTION_DEPTH}
+),
+root(id) AS (
+    SELECT id FROM ancestors ORDER BY depth DESC LIMIT 1
+),
+family(id, parent_id, depth, path) AS (
+    SELECT id, NULL, 0, printf('%05d', id) FROM root
+    UNION ALL
+    SELECT e.evolved_pokemon_id, e.base_pokemon_id, f.depth + 1, f.path || '/' || printf('%05d', e.evolved_pokemon_id)
+    FROM evolutions e JOIN family f ON e.base_pokemon_id = f.id
+    WHERE f.depth < {MAX_EVOLUTION_DEPTH}
+)
+SELECT f.id, p.name, p.en_name, p.image_path, f.parent_id, f.depth,
+       e.condition, e.evo_type, e.evo_level, e.evo_item
+FROM family f
+LEFT JOIN pokemon p ON p.id = f.id
+LEFT JOIN evolutions e ON e.base_pokemon_id = f.parent_id AND e.evolved_pokemon_id = f.id
+ORDER BY f.path
+"""
+
+@cached("evolution_families", get_read_version, max_entries=1024)
+def get_evolution_family(pokemon_id):
+    """
+    获取宝可梦所在的完整进化家族（一次递归CTE查询，包含所有分支）
+    按深度优先顺序返回家族成员，基础形态的 parent_id 为 None，其余成员带有从 parent_id 进化的条件；
+    没有进化关系的宝可梦只返回它自己
+    """
+    try:
+        cursor = get_read_connection().cursor()
+        cursor.execute(EVOLUTION_FAMILY_SQL, (pokemon_id,))
+        rows = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+    except Exception as e:
+        print(f"查询进化家族失败: {e}")
+        return []
+
 def insert_item(item_data):
     """插入物品信息"""
     if db_instance is None:
@@ -375,30 +1071,22 @@ def insert_item(item_data):
 
     try:
         cursor = db_instance.conn.cursor()
-        sql = """
-        INSERT OR IGNORE INTO items
-        (id, name, english, category, num, spritenum, desc, shortDesc, gen, isPokeball)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        cursor.execute(sql, (
-            item_data["id"], item_data["name"], item_data.get("english"),
-            item_data.get("category"), item_data.get("num"),
-            item_data.get("spritenum"), item_data.get("desc"),
-            item_data.get("shortDesc"), item_data.get("gen"),
-            item_data.get("isPokeball")
-        ))
+        cursor.execute(INSERT_ITEM_SQL, _item_params(item_data))
+        inserted = cursor.rowcount > 0  # INSERT OR IGNORE 忽略时 rowcount 为 0
         db_instance.conn.commit()
+        _data_changed()
+        if inserted and _stats_materializer is not None:
+            _stats_materializer.add_item(item_data)
+            _restamp_stats_materializer()
         print(f"成功插入物品: {item_data['name']}")
     except Exception as e:
         print(f"插入物品失败: {e}")
 
+@cached("all_items", get_read_version, max_entries=1)
 def get_all_items():
     """获取所有物品信息"""
-    if db_instance is None:
-        init_db()
-
     try:
-        cursor = db_instance.conn.cursor()
+        cursor = get_read_connection().cursor()
         cursor.execute("SELECT * FROM items ORDER BY id")
         rows = cursor.fetchall()
         columns = [desc[0] for desc in cursor.description]
@@ -408,8 +1096,95 @@ def get_all_items():
         return []
 
 def close_db():
-    """关闭数据库连接"""
-    global db_instance
+    """关闭数据库连接（写连接、所有只读连接、内存副本和查询线程池）"""
+    global db_instance, _read_executor, _memory_replica
+    if _read_executor is not None:
+        _read_executor.shutdown(wait=True)
+        _read_executor = None
+    with _read_connections_lock:
+        for conn in _read_connections:
+            conn.close()
+        _read_connections.clear()
+    _read_local.__dict__.clear()
+    if _memory_replica is not None:
+        _memory_replica.anchor.close()
+        _memory_replica = None
     if db_instance:
         db_instance.close()
         db_instance = None
+
+# 蓝绿重建：新数据库在目标旁边的临时文件中建好，再用 os.replace 原子替换
+BUILD_SUFFIX = ".building"
+# Windows 上目标文件正被其他进程打开时替换会失败，重试的次数和间隔（秒）
+REPLACE_RETRIES = 5
+REPLACE_RETRY_DELAY = 0.2
+
+def _remove_database_files(path):
+    """删除数据库文件及其 -wal/-shm/-journal 文件"""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+def _check_built_database(conn):
+    """替换前检查新数据库：完整性检查通过且有宝可梦数据，否则抛出 RuntimeError"""
+    result = conn.execute("PRAGMA quick_check").fetchone()[0]
+    if result != "ok":
+        raise RuntimeError(f"新数据库完整性检查失败: {result}")
+    count = conn.execute("SELECT COUNT(*) FROM pokemon").fetchone()[0]
+    if count == 0:
+        raise RuntimeError("新数据库中没有宝可梦数据")
+    return count
+
+def _replace_database_file(built_path, target):
+    """
+    用建好的文件原子替换目标
+    先把目标的WAL检查点并截断：WAL按路径而不是按文件关联，替换后残留的旧WAL帧会被应用到新文件上
+    """
+    if os.path.exists(target) and os.path.exists(target + "-wal"):
+        conn = sqlite3.connect(target)
+        try:
+            busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+        finally:
+            conn.close()
+        if busy:
+            raise RuntimeError(f"数据库正在被其他连接写入，无法替换: {target}")
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(built_path, target)
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(REPLACE_RETRY_DELAY)
+
+@contextlib.contextmanager
+def build_database_file(target=None):
+    """
+    蓝绿重建（上下文管理器）：with 块内本进程的数据库连接都指向与目标同目录的临时文件，
+    正常退出时检查新数据库并用 os.replace 原子替换目标；出错时删除临时文件，目标保持不变
+    替换完成前正在运行的 API 一直读取旧文件，之后由数据版本（含 inode）发现新文件，
+    重建内存副本、重新打开连接并丢弃旧版本的缓存
+    """
+    global DB_PATH
+    previous = DB_PATH
+    target = os.path.abspath(target or DB_PATH)
+    built_path = target + BUILD_SUFFIX
+    close_db()
+    _remove_database_files(built_path)
+    DB_PATH = built_path
+    try:
+        init_db()
+        yield built_path
+        count = _check_built_database(db_instance.conn)
+        # 关闭最后一个连接时WAL被检查点并删除，临时文件自身包含全部数据
+        close_db()
+        _replace_database_file(built_path, target)
+        print(f"数据库已替换: {target}（{count} 个宝可梦）")
+    except BaseException:
+        close_db()
+        _remove_database_files(built_path)
+        raise
+    finally:
+        DB_PATH = previous
@@ -0,0 +1,225 @@
+# dataset.py
+"""
+打包的数据集
+
+爬虫输出在多个目录中，是几千个缩进格式的小JSON文件。compile_dataset 把它们编译成一个
+SQLite 文件（backend/spider/dataset.db）：
+- 每个源文件一行，内容是紧凑JSON，同时保存源文件的大小、修改时间和内容哈希；
+- 按 (数据源, 编号) 建了索引，可以按编号随机读取。
+
+API 和导入代码只读取这个文件，不再遍历目录，导入清单也直接使用其中的哈希。
+数据集是生成的文件，不纳入版本管理，导入和 API 启动时都会先增量编译。
+
+编译是增量的：只重新读取大小或修改时间与数据集中记录不一致的源文件，其余的行直接复制。
+新数据集先写入临时文件，再原子替换。数据集带两个版本：格式版本记在 user_version，
+内容版本是全部源文件哈希的摘要。
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import functools
+from datetime import datetime
+try:
+    from .ingest_manifest import SPIDER_ROOT, MANIFEST_SOURCES, scan_sources, record_key
+    from .ingest import IngestPipeline, INGEST_WORKERS, INGEST_CHUNK_SIZE
+except ImportError:
+    from ingest_manifest import SPIDER_ROOT, MANIFEST_SOURCES, scan_sources, record_key
+    from ingest import IngestPipeline, INGEST_WORKERS, INGEST_CHUNK_SIZE
+
+DATASET_PATH = os.path.join(SPIDER_ROOT, "dataset.db")
+
+# 数据集的格式版本，表结构或内容编码变化时加一（旧格式的数据集会被完整重新编译）
+DATASET_FORMAT_VERSION = 1
+
+# 打包的数据源：导入清单跟踪的数据源，以及只供读取的进化链
+DATASET_SOURCES = dict(MANIFEST_SOURCES, evolutions='pokemon_evolutions')
+
+# records 表的字段（data 之外与 scan_sources/导入清单对应）
+RECORD_COLUMNS = ('path', 'source', 'record_key', 'size', 'mtime_ns', 'hash', 'data')
+
+DATASET_SCHEMA = [
+    """
+    CREATE TABLE records (
+        path TEXT NOT NULL UNIQUE,      -- 源文件相对路径（如 pokemon_data_all/25_pikachu.json）
+        source TEXT NOT NULL,           -- 数据源（DATASET_SOURCES 的键）
+        record_key INTEGER NOT NULL,    -- 文件名中的编号
+        size INTEGER NOT NULL,          -- 源文件大小
+        mtime_ns INTEGER NOT NULL,      -- 源文件修改时间（纳秒）
+        hash TEXT NOT NULL,             -- 源文件内容的 SHA-256
+        data TEXT NOT NULL              -- 紧凑JSON
+    )
+    """,
+    "CREATE INDEX idx_records_source_key ON records(source, record_key)",
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+]
+
+
+def dataset_path(source, filename):
+    """数据源中文件的相对路径（数据集中记录的键）"""
+    return f"{DATASET_SOURCES[source]}/{filename}"
+
+
+def pack_file(path, spider_root=SPIDER_ROOT):
+    """
+    读取一个源文件，返回 (相对路径, 编号, 内容哈希, 紧凑JSON)
+    可以作为 IngestPipeline 的解析函数，在读取进程中完成
+    """
+    with open(os.path.join(spider_root, path), 'rb') as f:
+        content = f.read()
+    data = json.loads(content)
+    compact = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return path, record_key(path), hashlib.sha256(content).hexdigest(), compact
+
+
+def _content_version(rows):
+    """内容版本：按路径排序的 (路径, 哈希) 的摘要"""
+    digest = hashlib.sha256()
+    for path, file_hash in sorted(rows):
+        digest.update(f"{path}\0{file_hash}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class Dataset:
+    """只读打开的数据集（上下文管理器）"""
+
+    def __init__(self, path=DATASET_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        format_version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if format_version != DATASET_FORMAT_VERSION:
+            self.conn.close()
+            raise ValueError(f"数据集格式版本 {format_version} 与当前版本 {DATASET_FORMAT_VERSION} 不一致: {path}")
+        self.meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        self.version = self.meta.get("content_version")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def entries(self, sources=None):
+        """
+        源文件的状态，{相对路径: (数据源, 编号, 大小, 修改时间纳秒, 哈希)}
+        :param sources: 数据源名称的集合，为 None 时返回全部
+        """
+        entries = {}
+        for path, source, key, size, mtime_ns, file_hash in self.conn.execute(
+                "SELECT path, source, record_key, size, mtime_ns, hash FROM records"):
+            if sources is None or source in sources:
+                entries[path] = (source, key, size, mtime_ns, file_hash)
+        return entries
+
+    def get(self, path):
+        """按相对路径读取一个文件的内容，不存在时返回 None"""
+        row = self.conn.execute("SELECT data FROM records WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def records(self, source, keys=None):
+        """
+        按文件名顺序返回数据源中的 (相对路径, 内容)；keys 不为 None 时只返回这些编号的文件（使用索引）
+        同一编号的形态相邻，基础形态的文件名是其余形态的前缀，排在最前
+        """
+        if keys is None:
+            rows = self.conn.execute(
+                "SELECT path, data FROM records WHERE source = ? ORDER BY path", (source,)
+            ).fetchall()
+        else:
+            rows = []
+            for key in keys:
+                rows.extend(self.conn.execute(
+                    "SELECT path, data FROM records WHERE source = ? AND record_key = ?", (source, key)
+                ))
+            rows.sort()
+        for path, data in rows:
+            yield path, json.loads(data)
+
+
+def open_dataset(path=DATASET_PATH):
+    """只读打开数据集；文件不存在时打印提示并返回 None（先运行 compile_dataset）"""
+    if not os.path.exists(path):
+        print(f"数据集不存在: {path}（运行 python db/dataset.py 编译）")
+        return None
+    return Dataset(path)
+
+
+def _previous_records(path):
+    """已有数据集中的源文件状态 {相对路径: (大小, 修改时间纳秒)}；不存在或格式版本不一致时为空"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with Dataset(path) as dataset:
+            return {p: (entry[2], entry[3]) for p, entry in dataset.entries().items()}
+    except (sqlite3.Error, ValueError) as e:
+        print(f"忽略已有数据集，重新完整编译: {e}")
+        return {}
+
+
+def compile_dataset(path=DATASET_PATH, spider_root=SPIDER_ROOT, workers=INGEST_WORKERS):
+    """
+    把爬虫输出目录编译为数据集（增量），源文件没有变化时不改动数据集
+    :return: 是否写入了新的数据集
+    """
+    started = time.perf_counter()
+    files = scan_sources(spider_root, DATASET_SOURCES)
+    previous = _previous_records(path)
+    changed = sorted(p for p, (_, size, mtime_ns) in files.items() if previous.get(p) != (size, mtime_ns))
+    removed = set(previous) - set(files)
+    if not changed and not removed:
+        print(f"数据集已是最新: {len(files)} 个源文件")
+        return False
+    print(f"编译数据集: {len(changed)} 个源文件需要读取，{len(removed)} 个已删除，"
+          f"{len(files) - len(changed)} 个未变化")
+
+    built_path = path + ".building"
+    if os.path.exists(built_path):
+        os.remove(built_path)
+    conn = sqlite3.connect(built_path)
+    try:
+        for sql in DATASET_SCHEMA:
+            conn.execute(sql)
+        insert_sql = (f"INSERT INTO records ({', '.join(RECORD_COLUMNS)}) "
+                      f"VALUES ({', '.join('?' for _ in RECORD_COLUMNS)})")
+        # 未变化的行从已有数据集复制
+        if len(changed) < len(files):
+            unchanged = set(files) - set(changed)
+            with Dataset(path) as dataset:
+                conn.executemany(insert_sql, (
+                    row for row in dataset.conn.execute(f"SELECT {', '.join(RECORD_COLUMNS)} FROM records")
+                    if row[0] in unchanged
+                ))
+        # 变化的源文件并行读取和压缩（文件很少时不启动读取进程）
+        pool_workers = workers if len(changed) > INGEST_CHUNK_SIZE else 1
+        with IngestPipeline(pool_workers) as pipeline:
+            packed = pipeline.submit("数据集", changed, functools.partial(pack_file, spider_root=spider_root))
+            conn.executemany(insert_sql, (
+                (p, files[p][0], key, files[p][1], files[p][2], file_hash, data)
+                for p, key, file_hash, data in packed
+            ))
+        count = conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ("content_version", _content_version(conn.execute("SELECT path, hash FROM records"))),
+            ("compiled_at", datetime.now().isoformat(timespec='seconds')),
+            ("record_count", str(count)),
+        ])
+        conn.execute(f"PRAGMA user_version = {DATASET_FORMAT_VERSION}")
+        conn.commit()
+        conn.execute("VACUUM")
+    except BaseException:
+        conn.close()
+        os.remove(built_path)
+        raise
+    conn.close()
+    os.replace(built_path, path)
+    print(f"数据集编译完成: {count} 个源文件，{os.path.getsize(path) // 1024} KB，"
+          f"用时 {time.perf_counter() - started:.3f} 秒")
+    return True
+
+
+if __name__ == "__main__":
+    compile_dataset()
@@ -0,0 +1,268 @@
+# evolution_graph.py
+"""
+宝可梦进化图
+
+根据数据集中 pokemon_data_all 的 evos/prevo/evo_* 字段一次性构建进化有向图，
+预先计算每个宝可梦所属的进化家族（基础形态）和从基础形态出发的全部分支路径，
+/api/pokemon/{id}/evolutions 只需查表，不再递归扫描数据库和读取JSON文件。
+
+load_evolution_edges 从同样的字段生成 evolutions 表的行（进化前 -> 进化后 的编号和结构化进化条件），
+导入数据时写入数据库，进化家族由 get_evolution_family 用递归CTE查询。
+"""
+import os
+import re
+try:
+    from .dataset import dataset_path
+except ImportError:
+    from dataset import dataset_path
+
+# 分支路径的最大长度（防止数据异常导致无限循环）
+MAX_CHAIN_STEPS = 10
+
+
+def format_evolution_condition(pokemon_data):
+    """根据宝可梦数据格式化进化条件"""
+    evo_type = pokemon_data.get('evo_type')
+    evo_level = pokemon_data.get('evo_level')
+    evo_item = pokemon_data.get('evo_item')
+
+    # 处理不同的进化类型
+    if evo_type == 'levelFriendship':
+        return "亲密度"
+    elif evo_type == 'useItem' and evo_item:
+        # 翻译常见的进化物品
+        item_translations = {
+            'Thunder Stone': '雷之石',
+            'Fire Stone': '火之石',
+            'Water Stone': '水之石',
+            'Leaf Stone': '叶之石',
+            'Moon Stone': '月之石',
+            'Sun Stone': '太阳石',
+            'Shiny Stone': '光之石',
+            'Dusk Stone': '暗之石',
+            'Dawn Stone': '觉醒之石',
+            'Ice Stone': '冰之石',
+            'Metal Alloy': '合金块',
+            'Syrupy Apple': '蜜汁苹果',
+            'Unremarkable Teacup': '不起眼的茶碗',
+            'Masterpiece Teacup': '杰作茶碗',
+            'Galarica Wreath': '伽勒尔花冠',
+            'Dragon Scale': '龙之鳞片',
+            'King\'s Rock': '王者之证',
+            'Deep Sea Tooth': '深海之牙',
+            'Deep Sea Scale': '深海鳞片',
+            'Upgrade': '金属膜',
+            'Protector': '防护罩',
+            'Electirizer': '电引擎',
+            'Magmarizer': '熔岩引擎',
+            'Dubious Disc': '可疑补丁',
+            'Reaper Cloth': '怨念布',
+            'Prism Scale': '美丽鳞片',
+            'Whipped Dream': '泡绵奶油',
+            'Sachet': '香袋',
+            'Razor Claw': '锐利之爪',
+            'Razor Fang': '锐利之牙',
+            'Auspicious Armor': '吉利拳套',          # 朱／紫 新增
+            'Malicious Armor': '凶恶拳套',          # 朱／紫 新增
+            'Peat Block': '泥炭块',                # 朱／紫 DLC 新增（用于土王进化）
+            'Linking Cord': '连接线绳',             # 朱／紫 新增（快速进化，如小箭雀→火箭雀）
+            'Cracked Pot': '裂纹壶',               # 茶杯系列基础形态
+            'Chipped Pot': '缺角壶',               # 茶杯系列中间形态（非进化道具，但相关）
+        }
+        item_name = item_translations.get(evo_item, evo_item)
+        return f"使用{item_name}"
+    elif evo_type == 'trade' and evo_item:
+        return f"交换（持有{evo_item}）"
+    elif evo_type == 'trade':
+        return "交换"
+    elif evo_type == 'levelMove':
+        return "等级+学习技能"
+    elif evo_type == 'levelHold' and evo_item:
+        return f"等级+持有{evo_item}"
+    elif evo_type == 'levelExtra':
+        return "等级+额外条件"
+    elif evo_type == 'other':
+        return "特殊进化"
+    elif evo_level:
+        return f"等级{evo_level}"
+    else:
+        return "进化条件未知"
+
+
+# evolutions 表中与 load_evolution_edges 返回的行对应的字段
+EVOLUTION_COLUMNS = ('base_pokemon_id', 'evolved_pokemon_id', 'condition', 'evo_type', 'evo_level', 'evo_item')
+
+
+def name_key(name):
+    """名称的匹配键：小写并去掉空格、连字符和标点（与数据文件名中的形态名一致，如 Mr. Mime-Galar -> mrmimegalar）"""
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+def load_evolution_edges(dataset):
+    """
+    读取数据集中全部形态的 prevo 和 evo_* 字段，返回 evolutions 表的行（字典，键为 EVOLUTION_COLUMNS）
+
+    先用全部形态的名称和文件名建立 名称 -> 编号 的映射，再把 prevo 解析为编号，
+    地区形态的进化（如 Meowth-Galar -> Perrserker）因此也能对应到图鉴编号。
+    同一对编号有多个形态时（如 Raichu 和 Raichu-Alola 都由 Pikachu 进化），保留基础形态的进化条件。
+    dataset 为 None 时返回空列表。
+    """
+    if dataset is None:
+        return []
+
+    forms = []
+    name_to_id = {}
+    # 按文件名顺序，同一编号下基础形态（名称是其余形态的前缀）在前
+    for path, data in dataset.records('pokemon'):
+        parts = os.path.basename(path)[:-5].split('_', 1)
+        try:
+            pokemon_id = int(parts[0])
+        except ValueError as e:
+            print(f"读取数据文件失败 {os.path.basename(path)}: {e}")
+            continue
+        forms.append((pokemon_id, data))
+        if len(parts) > 1:
+            name_to_id.setdefault(parts[1], pokemon_id)
+        if data.get('name'):
+            name_to_id.setdefault(name_key(data['name']), pokemon_id)
+
+    edges = {}
+    for pokemon_id, data in forms:
+        prevo = data.get('prevo')
+        if not prevo:
+            continue
+        base_id = name_to_id.get(name_key(prevo))
+        if base_id is None:
+            print(f"无法解析进化前形态 {prevo} -> {data.get('name')}")
+            continue
+        if (base_id, pokemon_id) in edges:
+            continue
+        edges[(base_id, pokemon_id)] = {
+            'base_pokemon_id': base_id,
+            'evolved_pokemon_id': pokemon_id,
+            'condition': format_evolution_condition(data),
+            'evo_type': data.get('evo_type'),
+            'evo_level': data.get('evo_level'),
+            'evo_item': data.get('evo_item'),
+        }
+    return list(edges.values())
+
+
+class EvolutionGraph:
+    """
+    进化图（构建后只读，数据版本变化时整体重建）
+
+    节点以小写名称为键，只有 `{id}_{小写名称}.json` 存在的宝可梦才是图中的节点；
+    家族以基础形态的节点键标识，分支路径在构建时按家族预先计算。
+    """
+
+    def __init__(self, pokemon_list, dataset, version=None):
+        """
+        :param pokemon_list: get_all_pokemon() 返回的宝可梦列表，用于名称和id的互查
+        :param dataset: 打包的数据集（dataset.Dataset），为 None 时进化图为空
+        :param version: 构建时的数据版本
+        """
+        self.version = version
+        self._id_to_name = {}   # id -> 名称
+        self._name_to_id = {}   # 小写名称 -> id
+        for p in pokemon_list:
+            self._id_to_name.setdefault(p['id'], p['name'])
+            self._name_to_id.setdefault(p['name'].lower(), p['id'])
+
+        # 小写名称 -> {"id", "prevo", "evos", "condition"}
+        self._nodes = {}
+        for name_key, pokemon_id in self._name_to_id.items():
+            data = dataset.get(dataset_path('pokemon', f"{pokemon_id}_{name_key}.json")) if dataset is not None else None
+            if data is None:
+                continue
+            self._nodes[name_key] = {
+                "id": pokemon_id,
+                "prevo": data.get('prevo'),
+                "evos": data.get('evos') or [],
+                "condition": format_evolution_condition(data)
+            }
+
+        # 节点 -> (家族键, 基础形态显示名)；家族键 -> 分支路径
+        self._family = {}
+        self._chains = {}
+        for name_key in self._nodes:
+            family = self._find_base_form(name_key)
+            self._family[name_key] = family
+            family_key = family[0]
+            if family_key not in self._chains:
+                self._chains[family_key] = self._build_branches(family_key)
+
+        print(f"进化图构建完成: {len(self._nodes)} 个节点，{len(self._chains)} 个进化家族")
+
+    def _find_base_form(self, name):
+        """沿 prevo 向上查找基础形态，返回 (节点键, 显示名)"""
+        visited = set()
+        path = []
+        while True:
+            name_key = name.lower()
+            if name_key in visited or name_key not in self._nodes:
+                break
+            visited.add(name_key)
+            path.append(name)
+            prevo = self._nodes[name_key]["prevo"]
+            if not prevo:
+                break
+            name = prevo
+        # 上一形态无法解析时，最后一个可解析的形态就是基础形态
+        base = path[-1]
+        return base.lower(), base
+
+    def _build_branches(self, base_key):
+        """从基础形态出发，深度优先构建全部分支路径（每条路径以没有进化形态的节点结束）"""
+        chains = []
+        visited = set()
+
+        def walk(name, current_chain, step_count):
+            name_key = name.lower()
+            if name_key in visited or step_count >= MAX_CHAIN_STEPS:
+                return
+            node = self._nodes.get(name_key)
+            if node is None:
+                return
+
+            new_chain = current_chain + [(node["id"], name, node["condition"] if step_count > 0 else None)]
+
+            if not node["evos"]:
+                # 同一条路径只保留一次
+                names = [stage[1] for stage in new_chain]
+                if all([stage[1] for stage in existing] != names for existing in chains):
+                    chains.append(new_chain)
+                return
+
+            visited.add(name_key)
+            for evo_name in node["evos"]:
+                walk(evo_name, new_chain, step_count + 1)
+
+        walk(base_key, [], 0)
+        return chains
+
+    def get_evolution_chains(self, pokemon_id):
+        """
+        获取宝可梦的完整进化链（含分支），每条链是 {"id", "name", "condition"} 列表
+        复杂度与链长成正比，不访问数据库和文件
+        """
+        name = self._id_to_name.get(pokemon_id)
+        if name is None:
+            return []
+        name_key = name.lower()
+        node = self._nodes.get(name_key)
+        if node is None or node["id"] != pokemon_id:
+            return []
+
+        # 基础形态沿用查找路径上的名称写法（从自身开始时为小写名称）
+        family_key, base_name = self._family[name_key]
+
+        chains = []
+        for chain in self._chains.get(family_key, []):
+            stages = [
+                {"id": stage_id, "name": stage_name, "condition": condition}
+                for stage_id, stage_name, condition in chain
+            ]
+            stages[0]["name"] = base_name
+            chains.append(stages)
+        return chains
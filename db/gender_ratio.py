@@ -0,0 +1,57 @@
+# gender_ratio.py
+"""
+雌雄比例
+
+雌雄比例保存为数值字段 male_ratio / female_ratio，接口仍返回
+{"M": 0.875, "F": 0.125} 结构的 gender_ratio，读取时不再逐行解析JSON；
+按性别过滤可以使用 male_ratio 上的索引。
+"""
+import json
+
+# 雌雄比例字段，在 pokemon 和 pokemon_forms 表中的顺序与这里一致
+GENDER_COLUMNS = ('male_ratio', 'female_ratio')
+
+# 按性别过滤的条件（male_ratio 为 NULL 表示数据中没有雌雄比例）
+# 爬虫数据对无性别、仅雄性、仅雌性以及未记录比例的宝可梦都保存为空的 gender_ratio（{}），
+# 无法区分，所以只提供有雌雄比例记录的 mixed；数据能区分这些情况后再增加对应的过滤值
+GENDER_FILTERS = {
+    'mixed': "male_ratio > 0 AND male_ratio < 1",         # 雌雄都有
+}
+
+
+def gender_columns(gender_ratio):
+    """
+    把 gender_ratio（字典或JSON字符串）转换为 (male_ratio, female_ratio)
+    没有雌雄比例或无法解析时都为 None
+    """
+    if isinstance(gender_ratio, str):
+        try:
+            gender_ratio = json.loads(gender_ratio)
+        except ValueError:
+            return None, None
+    if not isinstance(gender_ratio, dict):
+        return None, None
+    return gender_ratio.get('M'), gender_ratio.get('F')
+
+
+def with_gender_ratio(row, missing=None):
+    """
+    把数据库行中的雌雄比例字段合并为接口返回的 gender_ratio（放在原 male_ratio 的位置）
+    两个字段都为 NULL 时为 missing：列表接口返回 null，详情接口传入 {}（与原来的输出一致）
+    """
+    pokemon = {}
+    for key, value in row.items():
+        if key == 'male_ratio':
+            female = row.get('female_ratio')
+            if value is None and female is None:
+                pokemon['gender_ratio'] = missing
+                continue
+            gender_ratio = {}
+            if value is not None:
+                gender_ratio['M'] = value
+            if female is not None:
+                gender_ratio['F'] = female
+            pokemon['gender_ratio'] = gender_ratio
+        elif key not in GENDER_COLUMNS:
+            pokemon[key] = value
+    return pokemon
@@ -0,0 +1,232 @@
+# ingest.py
+"""
+并行读取流水线和数据行转换
+
+爬虫数据目录中有几千个小JSON文件，编译数据集（见 dataset.py）时需要全部读取。读取、解析和
+哈希在进程池中并行进行：JSON解析受GIL限制，线程池无法利用多核。每个任务处理一批文件并返回
+结果。写入只在调用线程中进行：SQLite 连接只能在创建它的线程中使用。调用线程按文件顺序取回
+各批结果，以流的形式写入。多个数据源的读取任务可以同时提交，写入前一个数据源时，后面的已经
+在读取。
+
+导入时从数据集读取紧凑JSON，由 *_record 函数转换为数据库行，校验失败的记录被跳过。
+
+读取进度和吞吐量定期打印。
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from .pokemon_forms import form_to_pokemon
+except ImportError:
+    from pokemon_forms import form_to_pokemon
+
+# 读取进程数（为1时在调用线程中顺序读取）
+INGEST_WORKERS = os.cpu_count() or 1
+
+# 每个读取任务处理的文件数
+INGEST_CHUNK_SIZE = 50
+
+# 读取进度的打印间隔（秒）
+PROGRESS_INTERVAL = 1.0
+
+# 各数据源的必需字段，缺少时该文件不导入
+POKEMON_REQUIRED = ('id', 'name', 'type1', 'hp', 'attack', 'defense', 'sp_atk', 'sp_def', 'speed', 'total')
+MOVE_REQUIRED = ('name',)
+ITEM_REQUIRED = ('name',)
+
+
+def _require(data, fields):
+    """校验JSON对象和必需字段，不符合时抛出 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("数据不是JSON对象")
+    missing = [field for field in fields if data.get(field) is None]
+    if missing:
+        raise ValueError(f"缺少字段 {', '.join(missing)}")
+
+
+def _file_id(data, path):
+    """数据中的id，没有时使用文件名中的编号"""
+    return data["id"] if "id" in data else int(os.path.basename(path).split('_')[0])
+
+
+def pokemon_record(path, data, desc=None):
+    """
+    把一个宝可梦形态文件的内容（合并同名的描述文件 desc）转换为
+    (pokemon 表的行, (编号, 形态标识, form_to_pokemon() 的结果))
+    """
+    _require(data, POKEMON_REQUIRED)
+
+    pokemon_data = {
+        "id": data["id"],
+        "name": desc.get("name_en", data["name"]) if desc else data["name"],
+        "jp_name": None,  # 暂时为空
+        "en_name": desc.get("name_en") if desc else None,
+        "type1": data["type1"],
+        "type2": data.get("type2"),
+        "hp": data["hp"],
+        "attack": data["attack"],
+        "defense": data["defense"],
+        "sp_atk": data["sp_atk"],
+        "sp_def": data["sp_def"],
+        "speed": data["speed"],
+        "total": data["total"],
+        "height": data.get("height"),  # 身高
+        "weight": data.get("weight"),  # 体重
+        "gender_ratio": data.get("gender_ratio"),  # 雌雄比例
+        "description": desc.get("description") if desc else None,
+        "image_path": data.get("image_path")
+    }
+
+    parts = os.path.basename(path)[:-5].split('_', 1)
+    pokemon_id = int(parts[0])
+    form_key = parts[1] if len(parts) > 1 else ''
+    return pokemon_data, (pokemon_id, form_key, form_to_pokemon(pokemon_id, data))
+
+
+def move_record(path, data):
+    """把一个技能文件的内容转换为 moves 表的行"""
+    _require(data, MOVE_REQUIRED)
+    return {
+        "id": _file_id(data, path),
+        "name": data["name"],
+        "type": data.get("type"),
+        "category": data.get("category"),
+        "power": data.get("basePower"),  # JSON中是basePower
+        "accuracy": data.get("accuracy"),
+        "pp": data.get("pp"),
+        "desc": data.get("desc"),
+        "shortDesc": data.get("shortDesc")
+    }
+
+
+def item_record(path, data):
+    """把一个物品文件的内容转换为 items 表的行"""
+    _require(data, ITEM_REQUIRED)
+    return {
+        "id": _file_id(data, path),
+        "name": data["name"],
+        "english": data.get("english"),
+        "category": data.get("category"),
+        "num": data.get("num"),
+        "spritenum": data.get("spritenum"),
+        "desc": data.get("desc"),
+        "shortDesc": data.get("shortDesc"),
+        "gen": data.get("gen"),
+        "isPokeball": data.get("isPokeball")
+    }
+
+
+def convert_records(label, records, convert):
+    """逐条转换 Dataset.records() 的结果，转换失败的记录被跳过并打印原因"""
+    converted = skipped = 0
+    for path, data in records:
+        try:
+            row = convert(path, data)
+        except Exception as e:
+            skipped += 1
+            print(f"[{label}] 跳过 {os.path.basename(path)}: {e}")
+            continue
+        converted += 1
+        yield row
+    print(f"[{label}] 读取完成: {converted} 条记录，{skipped} 个错误")
+
+
+def _read_chunk(parse, paths):
+    """读取任务：解析一批文件，返回 (按文件顺序的结果, [(文件名, 错误信息), ...])"""
+    records = []
+    errors = []
+    for path in paths:
+        try:
+            records.append(parse(path))
+        except Exception as e:
+            errors.append((os.path.basename(path), str(e)))
+    return records, errors
+
+
+class IngestProgress:
+    """一个数据源的读取进度和吞吐量"""
+
+    def __init__(self, label, total):
+        self.label = label
+        self.total = total
+        self.files = 0
+        self.records = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def update(self, files, records, errors):
+        self.files += files
+        self.records += records
+        self.errors += errors
+        now = time.perf_counter()
+        if now - self._last_report >= PROGRESS_INTERVAL and self.files < self.total:
+            self._last_report = now
+            self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.files / elapsed if elapsed > 0 else 0.0
+        percent = self.files * 100 / self.total if self.total else 100
+        print(f"[{self.label}] 已读取 {self.files}/{self.total} 个文件（{percent:.0f}%），"
+              f"{self.records} 条记录，{self.errors} 个错误，{rate:.0f} 文件/秒")
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.files / elapsed if elapsed > 0 else 0.0
+        print(f"[{self.label}] 读取完成: {self.files} 个文件，{self.records} 条记录，"
+              f"{self.errors} 个错误，用时 {elapsed:.3f} 秒，{rate:.0f} 文件/秒")
+
+
+class IngestPipeline:
+    """
+    读取进程池（上下文管理器）
+
+    用法:
+        with IngestPipeline() as pipeline:
+            packed = pipeline.submit("数据集", paths, functools.partial(pack_file, spider_root=root))
+            conn.executemany(sql, packed)   # 写入前面的批次时后面的已经在读取
+    """
+
+    def __init__(self, workers=INGEST_WORKERS, chunk_size=INGEST_CHUNK_SIZE):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._pool = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        print(f"导入流水线: {self.workers} 个读取进程，每批 {self.chunk_size} 个文件")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._pool is not None:
+            # 出错时取消尚未开始的读取任务
+            self._pool.shutdown(wait=True, cancel_futures=exc_type is not None)
+            self._pool = None
+
+    def submit(self, label, paths, parse):
+        """
+        立即提交数据源的全部读取任务，返回按文件顺序产生解析结果的迭代器（在写入线程中消费）
+        parse(path) 必须是模块级函数或其 functools.partial（在进程间传递），校验失败时抛出异常，
+        该文件被跳过并打印原因
+        """
+        chunks = [paths[i:i + self.chunk_size] for i in range(0, len(paths), self.chunk_size)]
+        if self._pool is not None:
+            results = [self._pool.submit(_read_chunk, parse, chunk) for chunk in chunks]
+        else:
+            results = None
+        return self._stream(label, len(paths), chunks, results, parse)
+
+    def _stream(self, label, total, chunks, results, parse):
+        progress = IngestProgress(label, total)
+        for i, chunk in enumerate(chunks):
+            if results is not None:
+                records, errors = results[i].result()
+            else:
+                records, errors = _read_chunk(parse, chunk)
+            for filename, message in errors:
+                print(f"[{label}] 跳过 {filename}: {message}")
+            progress.update(len(chunk), len(records), len(errors))
+            yield from records
+        progress.finish()
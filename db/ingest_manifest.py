@@ -0,0 +1,113 @@
+# ingest_manifest.py
+"""
+导入清单（增量导入）
+
+ingest_manifest 表记录每个已导入的源文件：
+- 路径、大小、修改时间和内容哈希；
+- 它写入的数据行的键（文件名中的编号，与数据中的 id 一致）。
+
+源文件先由 dataset.py 编译进数据集，数据集中保存了同样的状态和哈希。增量导入时用数据集中的
+哈希与清单比较，内容确实变化或已删除的文件所对应的键需要重新导入，其余记录不读取。
+"""
+import os
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPIDER_ROOT = os.path.join(PROJECT_ROOT, "backend/spider")
+
+# 清单跟踪的数据源：名称 -> backend/spider 下的目录
+MANIFEST_SOURCES = {
+    'pokemon': 'pokemon_data_all',
+    'pokemon_desc': 'pokemon_descrptions',   # 宝可梦描述，变化时重新导入同编号的宝可梦
+    'moves': 'moves',
+    'items': 'items',
+    'pokemon_moves': 'pokemon_moves_data',  # 宝可梦可学会的技能（见 learnsets.py）
+}
+
+# ingest_manifest 表的字段，与 manifest_entry 返回的顺序一致
+MANIFEST_COLUMNS = ('path', 'source', 'record_key', 'size', 'mtime_ns', 'hash', 'ingested_at')
+
+UPSERT_MANIFEST_SQL = f"""
+INSERT OR REPLACE INTO ingest_manifest
+({', '.join(MANIFEST_COLUMNS)})
+VALUES ({', '.join('?' for _ in MANIFEST_COLUMNS)})
+"""
+
+DELETE_MANIFEST_SQL = "DELETE FROM ingest_manifest WHERE path = ?"
+
+
+def record_key(path):
+    """源文件对应的数据行的键（文件名中的编号）"""
+    return int(os.path.basename(path).split('_', 1)[0])
+
+
+def scan_sources(spider_root=SPIDER_ROOT, sources=None):
+    """
+    列出数据源中的全部JSON文件（只读取文件状态，不读取内容），编译数据集时用来找出变化的文件
+    :return: {相对路径: (数据源, 大小, 修改时间纳秒)}，相对路径使用 / 分隔
+    """
+    if sources is None:
+        sources = MANIFEST_SOURCES
+    files = {}
+    for source, directory in sources.items():
+        source_dir = os.path.join(spider_root, directory)
+        if not os.path.exists(source_dir):
+            print(f"数据目录不存在: {source_dir}")
+            continue
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                files[f"{directory}/{entry.name}"] = (source, stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def manifest_entry(path, entry):
+    """源文件的清单行（按 MANIFEST_COLUMNS 的顺序），entry 为 Dataset.entries() 中的值"""
+    source, key, size, mtime_ns, file_hash = entry
+    return path, source, key, size, mtime_ns, file_hash, datetime.now().isoformat(timespec='seconds')
+
+
+class ManifestDiff:
+    """源文件与清单的差异"""
+
+    def __init__(self):
+        self.changed = {}      # 相对路径 -> 清单行（新增或内容变化的文件）
+        self.removed = {}      # 相对路径 -> (数据源, 键)（已删除的文件）
+        self.touched = {}      # 相对路径 -> 清单行（修改时间变化但内容相同，只更新清单）
+        self.unchanged = 0
+
+    def affected_keys(self, *sources):
+        """指定数据源中需要重新导入的键（变化和已删除文件的键）"""
+        keys = {entry[2] for entry in self.changed.values() if entry[1] in sources}
+        keys.update(key for source, key in self.removed.values() if source in sources)
+        return keys
+
+    def __bool__(self):
+        return bool(self.changed or self.removed or self.touched)
+
+    def summary(self):
+        return (f"新增或变化 {len(self.changed)} 个，删除 {len(self.removed)} 个，"
+                f"仅修改时间变化 {len(self.touched)} 个，未变化 {self.unchanged} 个")
+
+
+def diff_manifest(manifest, entries):
+    """
+    比较清单和数据集中的源文件
+    :param manifest: {相对路径: (数据源, 键, 大小, 修改时间纳秒, 哈希)}
+    :param entries: Dataset.entries(MANIFEST_SOURCES) 的结果，格式与 manifest 相同
+    """
+    diff = ManifestDiff()
+    for path, entry in entries.items():
+        previous = manifest.get(path)
+        if previous == entry:
+            diff.unchanged += 1
+        elif previous is not None and previous[4] == entry[4]:
+            diff.touched[path] = manifest_entry(path, entry)
+        else:
+            diff.changed[path] = manifest_entry(path, entry)
+    for path, (source, key, _, _, _) in manifest.items():
+        if path not in entries:
+            diff.removed[path] = (source, key)
+    return diff
@@ -0,0 +1,96 @@
+# learnsets.py
+"""
+宝可梦可学会的技能
+
+数据集中 pokemon_moves_data 的每个 `{id}_{形态名}.json` 按学习方式列出 Showdown 的技能id
+（小写、去掉空格和标点，如 makeitrain），moves 表中是显示名称（Make It Rain）。导入时先用 moves 表
+一次建立 技能id -> moves.id 的映射，再把每个宝可梦的技能写入 pokemon_moves（含学习方式）。
+
+数据中没有升级学会的等级，level_learned 为 NULL。pokemon_moves 以图鉴编号为键，
+同一编号有多个形态文件时只导入基础形态（文件名最短，排序在前）。
+"""
+import os
+try:
+    from .evolution_graph import name_key
+except ImportError:
+    from evolution_graph import name_key
+
+# 学习方式：(pokemon_moves.method, 数据文件中的字段)，接口按这个顺序分组
+LEARN_METHODS = (
+    ('level_up', 'level_up'),   # 升级学会
+    ('egg', 'egg_moves'),       # 蛋招式
+    ('tm', 'tm_moves'),         # 技能机器
+    ('tutor', 'tutor_moves'),   # 教学招式
+)
+
+# pokemon_moves 表的字段，与 learnset_rows 返回的行对应
+POKEMON_MOVE_COLUMNS = ('pokemon_id', 'move_id', 'method', 'level_learned')
+
+
+def build_move_id_map(conn):
+    """Showdown 技能id -> moves.id（同名技能取编号最小的）"""
+    move_ids = {}
+    for move_id, name in conn.execute("SELECT id, name FROM moves ORDER BY id"):
+        move_ids.setdefault(name_key(name), move_id)
+    return move_ids
+
+
+def learnset_record(path, data):
+    """转换一个技能数据文件的内容，返回 (图鉴编号, {学习方式: [Showdown 技能id, ...]})"""
+    if not isinstance(data, dict):
+        raise ValueError("数据不是JSON对象")
+    pokemon_id = data["id"] if "id" in data else int(os.path.basename(path).split('_')[0])
+    learnset = {}
+    for method, field in LEARN_METHODS:
+        moves = data.get(field) or []
+        if not isinstance(moves, list):
+            raise ValueError(f"{field} 不是列表")
+        learnset[method] = moves
+    return pokemon_id, learnset
+
+
+def load_learnsets(dataset):
+    """按文件名顺序读取数据集中的全部技能数据（dataset 为 None 时返回空列表）"""
+    if dataset is None:
+        return []
+    learnsets = []
+    for path, data in dataset.records('pokemon_moves'):
+        try:
+            learnsets.append(learnset_record(path, data))
+        except Exception as e:
+            print(f"处理技能数据失败 {os.path.basename(path)}: {e}")
+    return learnsets
+
+
+def learnset_rows(learnsets, move_ids, pokemon_ids=None):
+    """
+    把 learnset_record 的结果转换为 pokemon_moves 表的行（字典，键为 POKEMON_MOVE_COLUMNS）
+    :param learnsets: 按文件名顺序的 learnset_record() 结果，同一编号只使用第一个
+    :param move_ids: build_move_id_map() 的结果
+    :param pokemon_ids: 不为 None 时只保留其中的编号（外键约束）
+    :return: (行列表, 无法解析的技能id集合)
+    """
+    rows = []
+    unresolved = set()
+    seen = set()
+    for pokemon_id, learnset in learnsets:
+        if pokemon_id in seen or (pokemon_ids is not None and pokemon_id not in pokemon_ids):
+            continue
+        seen.add(pokemon_id)
+        for method, _ in LEARN_METHODS:
+            added = set()
+            for showdown_id in learnset.get(method, ()):
+                move_id = move_ids.get(showdown_id)
+                if move_id is None:
+                    unresolved.add(showdown_id)
+                    continue
+                if move_id in added:
+                    continue
+                added.add(move_id)
+                rows.append({
+                    'pokemon_id': pokemon_id,
+                    'move_id': move_id,
+                    'method': method,
+                    'level_learned': None,
+                })
+    return rows, unresolved
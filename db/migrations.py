@@ -0,0 +1,378 @@
+# migrations.py
+"""
+数据库结构迁移
+
+schema_version 表记录已应用的迁移版本；PokemonDB 初始化时按版本号顺序
+执行尚未应用的迁移，每个迁移在一个事务中完成。新增索引、表或字段时
+在 MIGRATIONS 末尾追加一项即可，不需要再运行 recreate_db.py 重建数据库。
+
+直接运行本文件会对 db/pokemon.db 应用迁移，并用 EXPLAIN QUERY PLAN 检查索引是否被使用。
+"""
+import os
+import sqlite3
+from datetime import datetime
+try:
+    from .pokemon_forms import load_forms
+    from .search_index import fts_table_steps
+    from .gender_ratio import gender_columns
+    from .evolution_graph import load_evolution_edges
+    from .learnsets import build_move_id_map, load_learnsets, learnset_rows
+    from .dataset import open_dataset
+except ImportError:
+    from pokemon_forms import load_forms
+    from search_index import fts_table_steps
+    from gender_ratio import gender_columns
+    from evolution_graph import load_evolution_edges
+    from learnsets import build_move_id_map, load_learnsets, learnset_rows
+    from dataset import open_dataset
+
+
+# 迁移11时 pokemon_forms 的字段；迁移中的回填只能使用当时已有的字段，不随 pokemon_forms.FORM_COLUMNS 变化
+_FORM_COLUMNS_V11 = (
+    'base_pokemon_id', 'form_key', 'kind', 'name', 'jp_name', 'en_name', 'type1', 'type2',
+    'hp', 'attack', 'defense', 'sp_atk', 'sp_def', 'speed', 'total', 'height', 'weight',
+    'male_ratio', 'female_ratio', 'genderless', 'description', 'image_path'
+)
+
+
+def _with_dataset(load):
+    """打开数据集调用 load(dataset)；数据集不存在时以 None 调用（回填为空，之后由 insert_data.py 导入）"""
+    dataset = open_dataset()
+    if dataset is None:
+        return load(None)
+    with dataset:
+        return load(dataset)
+
+
+def _gender_columns_v7(gender_ratio):
+    """迁移7到11时的雌雄比例字段 (male_ratio, female_ratio, genderless)，genderless 在迁移12中删除"""
+    male, female = gender_columns(gender_ratio)
+    if male is None and female is None:
+        return None, None, None
+    return male, female, 1 if not male and not female else 0
+
+
+def _backfill_pokemon_forms(conn):
+    """从数据集回填 pokemon_forms（数据集不存在时跳过，之后由 insert_data.py 导入）"""
+    rows = _with_dataset(load_forms)
+    values = []
+    for row in rows:
+        row = dict(row)
+        row.update(zip(('male_ratio', 'female_ratio', 'genderless'), _gender_columns_v7(row.get('gender_ratio'))))
+        values.append(tuple(row.get(column) for column in _FORM_COLUMNS_V11))
+    conn.executemany(
+        f"INSERT OR REPLACE INTO pokemon_forms ({', '.join(_FORM_COLUMNS_V11)}) "
+        f"VALUES ({', '.join('?' for _ in _FORM_COLUMNS_V11)})",
+        values
+    )
+    print(f"已回填 {len(rows)} 个宝可梦形态")
+
+
+def _backfill_move_descriptions(conn):
+    """从数据集回填技能描述（数据集不存在时跳过，之后由 insert_data.py 导入）"""
+    def load(dataset):
+        rows = []
+        for path, data in dataset.records('moves') if dataset is not None else ():
+            try:
+                move_id = data["id"] if "id" in data else int(os.path.basename(path).split('_')[0])
+                rows.append((data.get("desc"), data.get("shortDesc"), move_id))
+            except Exception as e:
+                print(f"处理技能数据失败 {os.path.basename(path)}: {e}")
+        return rows
+    rows = _with_dataset(load)
+    conn.executemany('UPDATE moves SET "desc" = ?, shortDesc = ? WHERE id = ?', rows)
+    print(f"已回填 {len(rows)} 个技能描述")
+
+
+def _backfill_gender_columns(conn):
+    """把 gender_ratio 的JSON拆分到雌雄比例字段，并清空旧字段（旧版SQLite不支持删除字段，只能保留）"""
+    for table in ('pokemon', 'pokemon_forms'):
+        rows = conn.execute(f"SELECT rowid, gender_ratio FROM {table}").fetchall()
+        conn.executemany(
+            f"UPDATE {table} SET male_ratio = ?, female_ratio = ?, genderless = ?, gender_ratio = NULL "
+            f"WHERE rowid = ?",
+            [_gender_columns_v7(gender_ratio) + (rowid,) for rowid, gender_ratio in rows]
+        )
+        print(f"已回填 {table} 的 {len(rows)} 行雌雄比例")
+
+
+# 迁移8时 evolutions 的字段
+_EVOLUTION_COLUMNS_V8 = ('base_pokemon_id', 'evolved_pokemon_id', 'condition', 'evo_type', 'evo_level', 'evo_item')
+
+
+def _backfill_evolutions(conn):
+    """
+    从数据集回填进化关系（数据集不存在时跳过，之后由 insert_data.py 导入）
+    只回填两端都已在 pokemon 表中的关系（外键约束），新建的空数据库由 insert_data.py 导入
+    """
+    existing = {row[0] for row in conn.execute("SELECT id FROM pokemon")}
+    edges = [
+        edge for edge in _with_dataset(load_evolution_edges)
+        if edge['base_pokemon_id'] in existing and edge['evolved_pokemon_id'] in existing
+    ]
+    conn.executemany(
+        f"INSERT OR REPLACE INTO evolutions ({', '.join(_EVOLUTION_COLUMNS_V8)}) "
+        f"VALUES ({', '.join('?' for _ in _EVOLUTION_COLUMNS_V8)})",
+        [tuple(edge[column] for column in _EVOLUTION_COLUMNS_V8) for edge in edges]
+    )
+    print(f"已回填 {len(edges)} 条进化关系")
+
+
+# 迁移10时 pokemon_moves 的字段
+_POKEMON_MOVE_COLUMNS_V10 = ('pokemon_id', 'move_id', 'method', 'level_learned')
+
+
+def _backfill_pokemon_moves(conn):
+    """
+    从数据集回填宝可梦可学会的技能（数据集不存在时跳过，之后由 insert_data.py 导入）
+    只回填 pokemon 表和 moves 表中已有的宝可梦和技能（外键约束）
+    """
+    existing = {row[0] for row in conn.execute("SELECT id FROM pokemon")}
+    rows, unresolved = learnset_rows(
+        _with_dataset(load_learnsets), build_move_id_map(conn), existing
+    )
+    conn.executemany(
+        f"INSERT OR IGNORE INTO pokemon_moves ({', '.join(_POKEMON_MOVE_COLUMNS_V10)}) "
+        f"VALUES ({', '.join('?' for _ in _POKEMON_MOVE_COLUMNS_V10)})",
+        [tuple(row[column] for column in _POKEMON_MOVE_COLUMNS_V10) for row in rows]
+    )
+    print(f"已回填 {len(rows)} 条宝可梦技能，{len(unresolved)} 个技能id无法对应到技能表")
+
+
+# (版本号, 说明, 步骤列表)；步骤是SQL语句，或接收连接对象的函数（用于数据回填）
+MIGRATIONS = [
+    (1, "宝可梦表的属性和英文名索引", [
+        "CREATE INDEX IF NOT EXISTS idx_pokemon_type1 ON pokemon(type1)",
+        "CREATE INDEX IF NOT EXISTS idx_pokemon_type2 ON pokemon(type2)",
+        "CREATE INDEX IF NOT EXISTS idx_pokemon_en_name ON pokemon(en_name)",
+    ]),
+    (2, "技能关联表和进化链表的反向查询索引", [
+        "CREATE INDEX IF NOT EXISTS idx_pokemon_moves_move_id ON pokemon_moves(move_id)",
+        "CREATE INDEX IF NOT EXISTS idx_evolutions_base ON evolutions(base_pokemon_id)",
+        "CREATE INDEX IF NOT EXISTS idx_evolutions_evolved ON evolutions(evolved_pokemon_id)",
+    ]),
+    (3, "宝可梦形态表（地区形态、mega、gmax等）", [
+        """
+        CREATE TABLE IF NOT EXISTS pokemon_forms (
+            base_pokemon_id INTEGER NOT NULL,  -- 所属宝可梦的全国图鉴编号
+            form_key TEXT NOT NULL,            -- 形态标识（数据文件名中编号之后的部分，如 charizardmegax）
+            kind TEXT NOT NULL,                -- 形态类别：base/regional/mega/gmax/cosmetic
+            name TEXT NOT NULL,                -- 形态名称（如 "Charizard-Mega-X"）
+            jp_name TEXT,
+            en_name TEXT,
+            type1 TEXT NOT NULL,
+            type2 TEXT,
+            hp INTEGER,
+            attack INTEGER,
+            defense INTEGER,
+            sp_atk INTEGER,
+            sp_def INTEGER,
+            speed INTEGER,
+            total INTEGER,
+            height REAL,
+            weight REAL,
+            gender_ratio TEXT,                 -- 雌雄比例（JSON格式）
+            description TEXT,
+            image_path TEXT,
+            PRIMARY KEY (base_pokemon_id, form_key)
+        )
+        """,
+    ]),
+    (4, "技能属性/类别和物品类别索引（过滤选项的去重查询）", [
+        "CREATE INDEX IF NOT EXISTS idx_moves_type ON moves(type)",
+        "CREATE INDEX IF NOT EXISTS idx_moves_category ON moves(category)",
+        "CREATE INDEX IF NOT EXISTS idx_items_category ON items(category)",
+    ]),
+    (5, "技能表增加描述字段，并从数据集回填", [
+        'ALTER TABLE moves ADD COLUMN "desc" TEXT',
+        "ALTER TABLE moves ADD COLUMN shortDesc TEXT",
+        _backfill_move_descriptions,
+    ]),
+    (6, "宝可梦、技能、物品的全文搜索索引（FTS5，由触发器同步）",
+        fts_table_steps('pokemon') + fts_table_steps('moves') + fts_table_steps('items')),
+    (7, "雌雄比例拆分为数值字段（male_ratio/female_ratio/genderless），并建立性别过滤索引", [
+        "ALTER TABLE pokemon ADD COLUMN male_ratio REAL",
+        "ALTER TABLE pokemon ADD COLUMN female_ratio REAL",
+        "ALTER TABLE pokemon ADD COLUMN genderless INTEGER",
+        "ALTER TABLE pokemon_forms ADD COLUMN male_ratio REAL",
+        "ALTER TABLE pokemon_forms ADD COLUMN female_ratio REAL",
+        "ALTER TABLE pokemon_forms ADD COLUMN genderless INTEGER",
+        _backfill_gender_columns,
+        "CREATE INDEX IF NOT EXISTS idx_pokemon_male_ratio ON pokemon(male_ratio)",
+        "CREATE INDEX IF NOT EXISTS idx_pokemon_genderless ON pokemon(genderless)",
+    ]),
+    (8, "进化表增加结构化进化条件字段和 (进化前, 进化后) 唯一索引，并从数据集回填", [
+        "ALTER TABLE evolutions ADD COLUMN evo_type TEXT",
+        "ALTER TABLE evolutions ADD COLUMN evo_level INTEGER",
+        "ALTER TABLE evolutions ADD COLUMN evo_item TEXT",
+        # 之前的导入没有唯一约束，建立唯一索引前去掉重复的进化关系
+        """
+        DELETE FROM evolutions WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM evolutions GROUP BY base_pokemon_id, evolved_pokemon_id
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_evolutions_pair ON evolutions(base_pokemon_id, evolved_pokemon_id)",
+        # 唯一索引的前缀就是 base_pokemon_id，原来的单列索引不再需要
+        "DROP INDEX IF EXISTS idx_evolutions_base",
+        _backfill_evolutions,
+    ]),
+    (9, "导入清单表（源文件的大小、修改时间和内容哈希，用于增量导入）", [
+        """
+        CREATE TABLE IF NOT EXISTS ingest_manifest (
+            path TEXT PRIMARY KEY,        -- 相对 backend/spider 的路径（如 moves/1_pound.json）
+            source TEXT NOT NULL,         -- 数据源（见 ingest_manifest.MANIFEST_SOURCES）
+            record_key INTEGER NOT NULL,  -- 写入的数据行的键（文件名中的编号）
+            size INTEGER NOT NULL,        -- 文件大小（字节）
+            mtime_ns INTEGER NOT NULL,    -- 修改时间（纳秒）
+            hash TEXT NOT NULL,           -- 内容的 SHA-256
+            ingested_at TEXT              -- 导入时间
+        )
+        """,
+    ]),
+    (10, "宝可梦技能表增加学习方式（主键改为 宝可梦, 学习方式, 技能），并从数据集回填", [
+        # SQLite 不能修改主键，新建表复制旧数据后替换（旧数据都是升级学会的技能）
+        """
+        CREATE TABLE pokemon_moves_new (
+            pokemon_id INTEGER NOT NULL,
+            move_id INTEGER NOT NULL,
+            method TEXT NOT NULL,          -- 学习方式：level_up/egg/tm/tutor
+            level_learned INTEGER,         -- 升级学会的等级（数据中没有时为 NULL）
+            FOREIGN KEY(pokemon_id) REFERENCES pokemon(id),
+            FOREIGN KEY(move_id) REFERENCES moves(id),
+            PRIMARY KEY(pokemon_id, method, move_id)
+        )
+        """,
+        """
+        INSERT OR IGNORE INTO pokemon_moves_new (pokemon_id, move_id, method, level_learned)
+        SELECT pokemon_id, move_id, 'level_up', level_learned FROM pokemon_moves
+        """,
+        "DROP TABLE pokemon_moves",
+        "ALTER TABLE pokemon_moves_new RENAME TO pokemon_moves",
+        "CREATE INDEX IF NOT EXISTS idx_pokemon_moves_move_id ON pokemon_moves(move_id)",
+        _backfill_pokemon_moves,
+    ]),
+    # 已应用的迁移不会再次执行，形态的回填放在新的迁移中，已有数据库和新数据库都会执行
+    (11, "从数据集回填宝可梦形态（直接写入雌雄比例字段）", [
+        _backfill_pokemon_forms,
+    ]),
+    # 爬虫数据中无性别和未记录比例的宝可梦都是空的 gender_ratio，genderless 无法正确填写，也没有查询使用它的索引
+    (12, "删除无法从数据得到的 genderless 字段及其索引", [
+        "DROP INDEX IF EXISTS idx_pokemon_genderless",
+        "ALTER TABLE pokemon DROP COLUMN genderless",
+        "ALTER TABLE pokemon_forms DROP COLUMN genderless",
+    ]),
+]
+
+# (说明, 查询语句, 参数, 期望使用的索引)
+INDEX_CHECKS = [
+    ("按主属性查询宝可梦", "SELECT id FROM pokemon WHERE type1 = ?", ("Fire",), "idx_pokemon_type1"),
+    ("按副属性查询宝可梦", "SELECT id FROM pokemon WHERE type2 = ?", ("Flying",), "idx_pokemon_type2"),
+    ("按英文名查询宝可梦", "SELECT id FROM pokemon WHERE en_name = ?", ("Pikachu",), "idx_pokemon_en_name"),
+    ("查询会某个技能的宝可梦",
+     "SELECT p.* FROM pokemon p JOIN pokemon_moves pm ON p.id = pm.pokemon_id WHERE pm.move_id = ?",
+     (1,), "idx_pokemon_moves_move_id"),
+    ("查询宝可梦的技能列表",
+     "SELECT pm.method, pm.level_learned, m.id FROM pokemon_moves pm JOIN moves m ON m.id = pm.move_id "
+     "WHERE pm.pokemon_id = ? ORDER BY pm.method, pm.level_learned, m.name",
+     (25,), "sqlite_autoindex_pokemon_moves_1"),
+    ("查询宝可梦的进化形态",
+     "SELECT e.*, p.name AS evolved_name FROM evolutions e JOIN pokemon p ON e.evolved_pokemon_id = p.id "
+     "WHERE e.base_pokemon_id = ?",
+     (1,), "idx_evolutions_pair"),
+    ("查询宝可梦的进化前形态", "SELECT base_pokemon_id FROM evolutions WHERE evolved_pokemon_id = ?",
+     (2,), "idx_evolutions_evolved"),
+    ("查询宝可梦的变种形态",
+     "SELECT * FROM pokemon_forms WHERE base_pokemon_id = ? AND kind NOT IN ('mega', 'gmax') ORDER BY form_key",
+     (25,), "sqlite_autoindex_pokemon_forms_1"),
+    ("查询宝可梦的mega/gmax形态",
+     "SELECT form_key FROM pokemon_forms WHERE base_pokemon_id = ? AND kind IN ('mega', 'gmax') ORDER BY form_key",
+     (6,), "sqlite_autoindex_pokemon_forms_1"),
+    ("技能属性过滤选项",
+     "SELECT DISTINCT type FROM moves WHERE type IS NOT NULL AND type != '' ORDER BY type",
+     (), "idx_moves_type"),
+    ("物品类别过滤选项",
+     "SELECT DISTINCT category FROM items WHERE category IS NOT NULL AND category != '' ORDER BY category",
+     (), "idx_items_category"),
+    ("按性别过滤宝可梦（雌雄都有）", "SELECT id FROM pokemon WHERE male_ratio > 0 AND male_ratio < 1", (),
+     "idx_pokemon_male_ratio"),
+    # FTS5 查询计划中的 "M" 表示使用全文索引匹配，而不是扫描整张表
+    ("全文搜索技能", "SELECT rowid FROM moves_fts WHERE moves_fts MATCH ?", ('"fire"',), "INDEX 0:M"),
+]
+
+
+def get_schema_version(conn):
+    """当前已应用的最高迁移版本，未迁移过时为0"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TEXT
+    )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn, migrations=None):
+    """
+    按版本号顺序应用尚未执行的迁移
+    :return: 本次应用的版本号列表
+    """
+    if migrations is None:
+        migrations = MIGRATIONS
+    current = get_schema_version(conn)
+    conn.commit()
+
+    applied = []
+    for version, description, steps in sorted(migrations, key=lambda m: m[0]):
+        if version <= current:
+            continue
+        try:
+            conn.execute("BEGIN")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().isoformat(timespec='seconds'))
+            )
+            conn.commit()
+        except Exception as e:
+            # 回填步骤中的非数据库异常同样回滚整个迁移
+            conn.rollback()
+            print(f"迁移 {version}（{description}）失败: {e}")
+            raise
+        print(f"已应用迁移 {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+def check_index_usage(conn, checks=None):
+    """
+    用 EXPLAIN QUERY PLAN 检查查询是否使用了期望的索引
+    :return: [(说明, 是否使用, 查询计划), ...]
+    """
+    if checks is None:
+        checks = INDEX_CHECKS
+    results = []
+    for description, sql, params, index_name in checks:
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        used = any(index_name in detail for detail in plan)
+        results.append((description, used, plan))
+    return results
+
+
+if __name__ == "__main__":
+    db_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pokemon.db")
+    conn = sqlite3.connect(db_file)
+    apply_migrations(conn)
+    print(f"当前结构版本: {get_schema_version(conn)}")
+    all_used = True
+    for description, used, plan in check_index_usage(conn):
+        all_used = all_used and used
+        print(f"[{'OK' if used else '未使用索引'}] {description}: {' / '.join(plan)}")
+    conn.close()
+    if not all_used:
+        raise SystemExit(1)
@@ -1,5 +1,11 @@
 import sqlite3
 from sqlite3 import Error
+try:
+    from .migrations import apply_migrations, get_schema_version
+    from .gender_ratio import gender_columns
+except ImportError:
+    from migrations import apply_migrations, get_schema_version
+    from gender_ratio import gender_columns
 
 class PokemonDB:
     """宝可梦数据库操作类，用于初始化表和基础数据库操作"""
@@ -15,11 +21,16 @@ class PokemonDB:
         try:
             self.conn = sqlite3.connect(db_file)
             self.conn.execute("PRAGMA foreign_keys = ON")  # 开启外键约束
+            # INSERT OR REPLACE 删除旧行时也触发删除触发器，全文索引才能保持同步
+            self.conn.execute("PRAGMA recursive_triggers = ON")
             print(f"成功连接到数据库: {db_file}")
-            # 创建所有表
+            # 创建所有表，再应用尚未执行的结构迁移
             self.create_all_tables()
         except Error as e:
             print(f"数据库连接/创建表失败: {e}")
+            return
+        # 迁移失败时异常向上抛出（失败的迁移已回滚），不能在只迁移了一部分的结构上继续启动
+        self.migrate()
     
     def create_all_tables(self):
         """创建所有宝可梦相关的表"""
@@ -41,7 +52,7 @@ class PokemonDB:
             total INTEGER,                   -- 种族值总和
             height REAL,                     -- 身高（米）
             weight REAL,                     -- 体重（公斤）
-            gender_ratio TEXT,               -- 雌雄比例（JSON格式）
+            gender_ratio TEXT,               -- 雌雄比例（JSON格式，迁移7后改用 male_ratio/female_ratio）
             description TEXT,                -- 图鉴描述
             image_path TEXT                  -- 图片路径
         );
@@ -112,7 +123,12 @@ class PokemonDB:
             print("所有表创建成功（或已存在）")
         except Error as e:
             print(f"创建表失败: {e}")
-    
+
+    def migrate(self):
+        """应用尚未执行的结构迁移（见 migrations.py），返回本次应用的版本号列表"""
+        applied = apply_migrations(self.conn)
+        print(f"数据库结构版本: {get_schema_version(self.conn)}")
+        return applied
     
     
     def close(self):
@@ -145,24 +161,22 @@ class PokemonDB:
             "description": "脸颊两边有着小小的电力袋。遇到危险时就会放电。"
         }
         """
-        import json
         sql = """
         INSERT OR IGNORE INTO pokemon 
-        (id, name, jp_name, en_name, type1, type2, hp, attack, defense, sp_atk, sp_def, speed, total, height, weight, gender_ratio, description, image_path)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        (id, name, jp_name, en_name, type1, type2, hp, attack, defense, sp_atk, sp_def, speed, total, height, weight,
+         male_ratio, female_ratio, description, image_path)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         try:
             cursor = self.conn.cursor()
-            # 将gender_ratio转换为JSON字符串
-            gender_ratio = pokemon_data.get("gender_ratio")
-            gender_ratio_json = json.dumps(gender_ratio) if gender_ratio is not None else None
             cursor.execute(sql, (
                 pokemon_data["id"], pokemon_data["name"], pokemon_data.get("jp_name"),
                 pokemon_data.get("en_name"), pokemon_data["type1"], pokemon_data.get("type2"),
                 pokemon_data["hp"], pokemon_data["attack"], pokemon_data["defense"],
                 pokemon_data["sp_atk"], pokemon_data["sp_def"], pokemon_data["speed"],
-                pokemon_data["total"], pokemon_data.get("height"), pokemon_data.get("weight"),
-                gender_ratio_json, pokemon_data.get("description"), pokemon_data.get("image_path")
+                pokemon_data["total"], pokemon_data.get("height"), pokemon_data.get("weight")
+            ) + gender_columns(pokemon_data.get("gender_ratio")) + (
+                pokemon_data.get("description"), pokemon_data.get("image_path")
             ))
             self.conn.commit()
             print(f"成功插入宝可梦: {pokemon_data['name']}")
@@ -0,0 +1,145 @@
+# pokemon_forms.py
+"""
+宝可梦形态数据
+
+backend/spider/pokemon_data_all 中每个 `{id}_{形态名}.json` 是一个形态，
+导入数据时按形态类别（base/regional/mega/gmax/cosmetic）写入 pokemon_forms 表，
+接口只查询该表，不再在运行时遍历目录、按文件名子串判断mega/gmax。
+"""
+import os
+try:
+    from .gender_ratio import GENDER_COLUMNS, gender_columns, with_gender_ratio
+except ImportError:
+    from gender_ratio import GENDER_COLUMNS, gender_columns, with_gender_ratio
+
+# 形态类别
+FORM_KIND_BASE = 'base'
+FORM_KIND_REGIONAL = 'regional'
+FORM_KIND_MEGA = 'mega'
+FORM_KIND_GMAX = 'gmax'
+FORM_KIND_COSMETIC = 'cosmetic'
+
+# 详情接口中单独列出（mega_gmax_forms）而不放入 variants 的形态类别
+MEGA_GMAX_KINDS = (FORM_KIND_MEGA, FORM_KIND_GMAX)
+
+# 地区形态的名称后缀
+REGIONAL_SUFFIXES = ('alola', 'galar', 'hisui', 'paldea')
+
+# 与 pokemon 表相同的形态字段（雌雄比例是 GENDER_COLUMNS 两个数值字段）
+FORM_FIELDS = (
+    'name', 'jp_name', 'en_name', 'type1', 'type2', 'hp', 'attack', 'defense',
+    'sp_atk', 'sp_def', 'speed', 'total', 'height', 'weight'
+) + GENDER_COLUMNS + (
+    'description', 'image_path'
+)
+
+
+# pokemon_forms 表的写入语句，与 form_row_values 的顺序一致
+FORM_COLUMNS = ('base_pokemon_id', 'form_key', 'kind') + FORM_FIELDS
+INSERT_FORM_SQL = f"""
+INSERT OR REPLACE INTO pokemon_forms
+({', '.join(FORM_COLUMNS)})
+VALUES ({', '.join('?' for _ in FORM_COLUMNS)})
+"""
+
+
+def form_to_pokemon(pokemon_id, form_data):
+    """将pokemon_data_all中的形态数据转换为与数据库行相同结构的宝可梦数据"""
+    return {
+        'id': pokemon_id,
+        'name': form_data.get('name', ''),
+        'jp_name': form_data.get('jp_name'),
+        'en_name': form_data.get('en_name'),
+        'type1': form_data.get('type1', 'Normal'),
+        'type2': form_data.get('type2'),
+        'hp': form_data.get('hp'),
+        'attack': form_data.get('attack'),
+        'defense': form_data.get('defense'),
+        'sp_atk': form_data.get('sp_atk'),
+        'sp_def': form_data.get('sp_def'),
+        'speed': form_data.get('speed'),
+        'total': form_data.get('total', 0),
+        'height': form_data.get('height'),
+        'weight': form_data.get('weight'),
+        'gender_ratio': form_data.get('gender_ratio'),
+        'description': form_data.get('description'),
+        'image_path': form_data.get('image_path')
+    }
+
+
+def classify_form(form_name, base_name):
+    """
+    根据形态名相对基础形态名的后缀判断形态类别
+    如 Charizard-Mega-X -> mega，Raichu-Alola -> regional，Pikachu-Cosplay -> cosmetic
+    """
+    if form_name == base_name:
+        return FORM_KIND_BASE
+    if form_name.startswith(base_name + '-'):
+        suffix = form_name[len(base_name) + 1:]
+    else:
+        suffix = form_name.split('-', 1)[1] if '-' in form_name else ''
+    tokens = {token.lower() for token in suffix.split('-')}
+    if 'gmax' in tokens:
+        return FORM_KIND_GMAX
+    if 'mega' in tokens:
+        return FORM_KIND_MEGA
+    if tokens & set(REGIONAL_SUFFIXES):
+        return FORM_KIND_REGIONAL
+    return FORM_KIND_COSMETIC
+
+
+def load_forms(dataset):
+    """
+    读取数据集中的全部形态，按文件名顺序返回 pokemon_forms 表的行（dataset 为 None 时返回空列表）
+    同一编号下名称最短的形态（其余形态名都以它为前缀）是基础形态
+    """
+    if dataset is None:
+        return []
+
+    forms = []
+    for path, form_data in dataset.records('pokemon'):
+        filename = os.path.basename(path)
+        try:
+            # 解析文件名获取id和形态标识
+            parts = filename[:-5].split('_', 1)  # 移除.json后缀
+            pokemon_id = int(parts[0])
+            form_key = parts[1] if len(parts) > 1 else ''
+            forms.append((pokemon_id, form_key, form_to_pokemon(pokemon_id, form_data)))
+        except Exception as e:
+            print(f"处理形态数据失败 {filename}: {e}")
+    return build_form_rows(forms)
+
+
+def build_form_rows(forms):
+    """
+    把 (编号, 形态标识, form_to_pokemon() 的结果) 列表转换为 pokemon_forms 表的行，并判断形态类别
+    （需要同一编号的全部形态才能确定基础形态）
+    """
+    base_names = {}
+    for pokemon_id, _, form in forms:
+        name = form['name']
+        if pokemon_id not in base_names or len(name) < len(base_names[pokemon_id]):
+            base_names[pokemon_id] = name
+
+    rows = []
+    for pokemon_id, form_key, form in forms:
+        row = dict(form)
+        row['base_pokemon_id'] = row.pop('id')
+        row['form_key'] = form_key
+        row['kind'] = classify_form(form['name'], base_names[pokemon_id])
+        rows.append(row)
+    return rows
+
+
+def form_row_values(row):
+    """INSERT_FORM_SQL 的参数（gender_ratio 拆分为雌雄比例字段）"""
+    gender = dict(zip(GENDER_COLUMNS, gender_columns(row.get('gender_ratio'))))
+    return tuple(gender[column] if column in gender else row.get(column) for column in FORM_COLUMNS)
+
+
+def form_row_to_pokemon(row):
+    """将 pokemon_forms 表的行转换为接口返回的宝可梦数据（与 form_to_pokemon 的结构相同）"""
+    pokemon = {'id': row['base_pokemon_id']}
+    for field in FORM_FIELDS:
+        pokemon[field] = row.get(field)
+    return with_gender_ratio(pokemon, missing={})
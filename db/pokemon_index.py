@@ -0,0 +1,115 @@
+# pokemon_index.py
+"""
+宝可梦名称搜索索引
+
+在 load_pokemon_cache 时一次性构建，之后只读；
+/api/pokemon/search/{name} 的名称子串和序号匹配直接查倒排表，不再对每个请求逐条做字符串处理。
+列表接口 /api/pokemon?search= 的搜索和其他过滤、分页一起在 SQL 中完成（见 database.query_pokemon），
+不使用这个索引；两者的匹配语义相同（名称子串，纯数字时再加上序号），
+由 consistency_checks.check_name_search 检查结果一致。
+"""
+# 名称 n-gram 索引的最大长度（三元组）
+GRAM_SIZE = 3
+
+# 宝可梦参与名称搜索的字段
+POKEMON_NAME_FIELDS = ('name', 'en_name', 'jp_name')
+
+# 世代与编号范围的映射
+GEN_RANGES = {
+    1: (1, 151),
+    2: (152, 251),
+    3: (252, 386),
+    4: (387, 493),
+    5: (494, 649),
+    6: (650, 721),
+    7: (722, 809),
+    8: (810, 905),
+    9: (906, 1025)
+}
+
+
+class NameSearchIndex:
+    """
+    名称搜索索引：对预先转为小写的名称字段（name/en_name/jp_name）建立 1~3 元 n-gram 倒排表
+
+    - 子串：查询不超过3个字符时直接查表；更长的查询对各三元组求交得到候选，再做一次子串校验
+    - 序号：id -> 位置集合
+    匹配语义与原先的 `search.lower() in name.lower()` 完全一致
+    """
+
+    def __init__(self, rows):
+        """
+        :param rows: 宝可梦列表，位置即结果顺序
+        """
+        self._names = [
+            tuple(row[field].lower() for field in POKEMON_NAME_FIELDS if row.get(field))
+            for row in rows
+        ]
+
+        grams = {}
+        id_index = {}
+        for pos, names in enumerate(self._names):
+            id_index.setdefault(rows[pos]['id'], set()).add(pos)
+            for name in names:
+                for size in range(1, GRAM_SIZE + 1):
+                    for i in range(len(name) - size + 1):
+                        grams.setdefault(name[i:i + size], set()).add(pos)
+        self._grams = {gram: frozenset(positions) for gram, positions in grams.items()}
+        self._id_index = {pokemon_id: frozenset(positions) for pokemon_id, positions in id_index.items()}
+
+    def substring_positions(self, query):
+        """名称中包含 query（不区分大小写）的位置集合"""
+        query = query.lower()
+        if not query:
+            return set(range(len(self._names)))
+        if len(query) <= GRAM_SIZE:
+            return set(self._grams.get(query, ()))
+
+        posting_lists = []
+        for i in range(len(query) - GRAM_SIZE + 1):
+            positions = self._grams.get(query[i:i + GRAM_SIZE])
+            if not positions:
+                return set()
+            posting_lists.append(positions)
+        posting_lists.sort(key=len)
+        candidates = set(posting_lists[0])
+        for positions in posting_lists[1:]:
+            candidates &= positions
+            if not candidates:
+                return candidates
+        # 三元组全部命中不代表连续出现，需要校验
+        return {pos for pos in candidates if any(query in n for n in self._names[pos])}
+
+    def id_positions(self, pokemon_id):
+        """序号完全匹配的位置集合"""
+        return set(self._id_index.get(pokemon_id, ()))
+
+    def search(self, query):
+        """与原搜索逻辑一致：名称子串匹配，纯数字时再并上序号匹配"""
+        positions = self.substring_positions(query)
+        if query.isdigit():
+            positions |= self.id_positions(int(query))
+        return positions
+
+
+class PokemonIndex:
+    """宝可梦名称搜索索引（不可变快照，重建时整体替换）"""
+
+    def __init__(self, pokemon_list):
+        """
+        :param pokemon_list: get_all_pokemon() 返回的宝可梦列表，结果顺序与该列表一致
+        """
+        self.pokemon_list = pokemon_list
+        # 名称搜索索引，供 /api/pokemon/search/{name} 使用
+        self.search_index = NameSearchIndex(pokemon_list)
+
+    def search(self, name):
+        """按名称或序号搜索，返回按原列表顺序排列的宝可梦（同一id只保留第一个）"""
+        results = []
+        seen_ids = set()
+        for pos in sorted(self.search_index.search(name)):
+            pokemon = self.pokemon_list[pos]
+            if pokemon['id'] not in seen_ids:
+                results.append(pokemon)
+                seen_ids.add(pokemon['id'])
+        return results
@@ -0,0 +1,174 @@
+# search_index.py
+"""
+全文搜索索引
+
+pokemon、moves、items 各有一张 FTS5 外部内容表（不重复保存文本，只保存索引），
+由触发器在基础表插入、删除、更新时同步。使用 trigram 分词器：中文没有空格分词，
+trigram 按3个字符切分，中英文都能做子串匹配。
+
+少于3个字符的查询词 trigram 无法匹配，这时退回到基础表的子串扫描，并在 Python 中生成摘要。
+两种方式的摘要都先对文字做 HTML 转义再加高亮标记，可以直接作为 HTML 显示。
+"""
+import html
+
+# 每个数据源：(FTS表, 基础表, 索引字段, 标题字段, bm25字段权重)
+SEARCH_SOURCES = {
+    'pokemon': ('pokemon_fts', 'pokemon', ('name', 'en_name', 'description'), 'name', (10.0, 10.0, 1.0)),
+    'moves': ('moves_fts', 'moves', ('name', 'desc', 'shortDesc'), 'name', (10.0, 1.0, 1.0)),
+    'items': ('items_fts', 'items', ('name', 'english', 'desc', 'shortDesc'), 'name', (10.0, 10.0, 1.0, 1.0)),
+}
+
+# trigram 分词器能匹配的最短查询词
+MIN_TERM_LENGTH = 3
+
+# 摘要的高亮标记、省略号和长度（字符数）
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+SNIPPET_ELLIPSIS = '…'
+SNIPPET_TOKENS = 32
+
+# snippet() 中临时使用的高亮标记（私用区字符，数据中不会出现），转义后再替换为 HIGHLIGHT_OPEN/CLOSE
+_MARK_OPEN = '\ue000'
+_MARK_CLOSE = '\ue001'
+
+# 搜索结果的字段（FTS 和子串扫描两种方式相同，按这个顺序）
+SEARCH_RESULT_FIELDS = ('source', 'id', 'title', 'snippet', 'score')
+
+
+def _quote_column(column):
+    # desc 是SQL关键字
+    return f'"{column}"'
+
+
+def fts_table_steps(source):
+    """创建数据源的 FTS 表和同步触发器，并从基础表建立索引（迁移步骤）"""
+    fts_table, table, columns, _, _ = SEARCH_SOURCES[source]
+    column_list = ', '.join(_quote_column(c) for c in columns)
+    new_values = ', '.join(f'new.{_quote_column(c)}' for c in columns)
+    old_values = ', '.join(f'old.{_quote_column(c)}' for c in columns)
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column_list}, content='{table}', content_rowid='id', tokenize='trigram'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+        """,
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def split_terms(text):
+    """按空白拆分查询词（去重，保持顺序）"""
+    terms = []
+    for term in text.split():
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def build_match_query(terms):
+    """
+    把查询词转换为 FTS5 MATCH 表达式：每个词加引号作为短语（不解析用户输入中的语法），多个词为 AND
+    有词短于 MIN_TERM_LENGTH 时返回 None，需要退回子串扫描
+    """
+    if not terms or any(len(term) < MIN_TERM_LENGTH for term in terms):
+        return None
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def match_sql(source):
+    """FTS 查询：(来源, id, 标题, 摘要, 相关度)，相关度越小越相关；摘要需要经过 mark_snippet 转义"""
+    fts_table, _, _, title_column, weights = SEARCH_SOURCES[source]
+    return f"""
+    SELECT '{source}' AS source, rowid AS id, {_quote_column(title_column)} AS title,
+           snippet({fts_table}, -1, '{_MARK_OPEN}', '{_MARK_CLOSE}', '{SNIPPET_ELLIPSIS}', {SNIPPET_TOKENS}) AS snippet,
+           bm25({fts_table}, {', '.join(str(w) for w in weights)}) AS score
+    FROM {fts_table} WHERE {fts_table} MATCH ?
+    """
+
+
+def mark_snippet(snippet):
+    """把 snippet() 的结果做 HTML 转义，再把临时标记替换为高亮标记"""
+    if not snippet:
+        return ''
+    return html.escape(snippet).replace(_MARK_OPEN, HIGHLIGHT_OPEN).replace(_MARK_CLOSE, HIGHLIGHT_CLOSE)
+
+
+def _like_pattern(term):
+    """子串匹配的 LIKE 模式（转义 % _ 和转义符本身）"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def scan_query(source, terms):
+    """
+    短查询词的子串扫描：每个词都要出现在某个索引字段中
+    使用内置的 LIKE（ASCII 不区分大小写），比逐行调用 py_lower 快一个数量级
+    标题包含全部查询词的排在前面（相关度 0，否则为 1）；索引字段以JSON数组返回（各数据源的列数相同，
+    可以 UNION ALL），摘要由 make_snippet 生成
+    返回 (SQL, 参数)
+    """
+    _, table, columns, title_column, _ = SEARCH_SOURCES[source]
+    patterns = [_like_pattern(term) for term in terms]
+    title_clause = ' AND '.join(f"{_quote_column(title_column)} LIKE ? ESCAPE '\\'" for _ in patterns)
+    term_clause = '(' + ' OR '.join(f"{_quote_column(c)} LIKE ? ESCAPE '\\'" for c in columns) + ')'
+    sql = f"""
+    SELECT '{source}' AS source, id, {_quote_column(title_column)} AS title,
+           json_array({', '.join(_quote_column(c) for c in columns)}) AS fields,
+           CASE WHEN {title_clause} THEN 0 ELSE 1 END AS score
+    FROM {table} WHERE {' AND '.join(term_clause for _ in patterns)}
+    """
+    params = patterns + [pattern for pattern in patterns for _ in columns]
+    return sql, params
+
+
+def make_snippet(values, terms, width=SNIPPET_TOKENS):
+    """
+    在第一个包含查询词的字段中截取查询词附近约 width 个字符，转义后高亮（与 mark_snippet 的格式一致）
+    """
+    lowered_terms = [term.lower() for term in terms]
+    for value in values:
+        if not value:
+            continue
+        lowered = value.lower()
+        hits = [(lowered.find(term), term) for term in lowered_terms if term in lowered]
+        if not hits:
+            continue
+        first = min(position for position, _ in hits)
+        start = max(0, first - width // 4)
+        end = min(len(value), start + width)
+        spans = []
+        for term in lowered_terms:
+            position = lowered.find(term, start)
+            while position != -1 and position < end:
+                spans.append((position, min(position + len(term), end)))
+                position = lowered.find(term, position + len(term))
+        spans.sort()
+        parts = [SNIPPET_ELLIPSIS] if start > 0 else []
+        cursor = start
+        for span_start, span_end in spans:
+            if span_start < cursor:
+                continue
+            parts.append(html.escape(value[cursor:span_start]))
+            parts.append(HIGHLIGHT_OPEN + html.escape(value[span_start:span_end]) + HIGHLIGHT_CLOSE)
+            cursor = span_end
+        parts.append(html.escape(value[cursor:end]))
+        if end < len(value):
+            parts.append(SNIPPET_ELLIPSIS)
+        return ''.join(parts)
+    return ''
@@ -0,0 +1,107 @@
+# stats_materializer.py
+"""
+统计信息物化
+
+/api/stats 的属性分布、物品类别分布、技能属性分布和种族值汇总
+按数据版本计算一次后常驻内存；通过 insert_pokemon/insert_move/insert_item
+写入单行数据时增量更新，不再每次请求全表扫描重新计算。
+"""
+from collections import Counter
+
+# 参与汇总的种族值字段
+SUMMARY_STATS = ('total', 'hp', 'attack')
+
+
+def _increment(counts, key, delta):
+    """计数加减，减到0时删除该键（与全量计算的结果保持一致）"""
+    counts[key] = counts.get(key, 0) + delta
+    if counts[key] <= 0:
+        del counts[key]
+
+
+class StatsMaterializer:
+    """物化的统计信息，summary() 返回的结果在下一次变更前一直复用"""
+
+    def __init__(self, pokemon_list, items, moves, version=None):
+        """
+        :param pokemon_list: get_all_pokemon() 的结果
+        :param items: get_all_items() 的结果
+        :param moves: get_all_moves() 的结果
+        :param version: 计算时的数据版本
+        """
+        self.version = version
+        self._pokemon_count = 0
+        self._item_count = 0
+        self._move_count = 0
+        self._type_stats = {}
+        self._item_category_stats = {}
+        self._move_type_stats = {}
+        # 种族值 -> 出现次数，删除数据时也能得到正确的最大/最小值
+        self._base_stats = {stat: Counter() for stat in SUMMARY_STATS}
+        self._summary = None
+
+        for p in pokemon_list:
+            self.add_pokemon(p)
+        for i in items:
+            self.add_item(i)
+        for m in moves:
+            self.add_move(m)
+
+    def _apply_pokemon(self, pokemon, delta):
+        self._pokemon_count += delta
+        _increment(self._type_stats, pokemon['type1'], delta)
+        if pokemon.get('type2'):
+            _increment(self._type_stats, pokemon['type2'], delta)
+        for stat in SUMMARY_STATS:
+            value = pokemon.get(stat)
+            if value:
+                self._base_stats[stat][value] += delta
+                if self._base_stats[stat][value] <= 0:
+                    del self._base_stats[stat][value]
+        self._summary = None
+
+    def add_pokemon(self, pokemon):
+        """新增一个宝可梦"""
+        self._apply_pokemon(pokemon, 1)
+
+    def remove_pokemon(self, pokemon):
+        """移除一个宝可梦（INSERT OR REPLACE 覆盖旧行时使用）"""
+        self._apply_pokemon(pokemon, -1)
+
+    def add_item(self, item):
+        """新增一个物品"""
+        self._item_count += 1
+        _increment(self._item_category_stats, item.get('category', '其他'), 1)
+        self._summary = None
+
+    def add_move(self, move):
+        """新增一个技能"""
+        self._move_count += 1
+        _increment(self._move_type_stats, move.get('type', 'Normal'), 1)
+        self._summary = None
+
+    def _average(self, stat):
+        values = self._base_stats[stat]
+        count = sum(values.values())
+        return sum(value * n for value, n in values.items()) / count if count else 0
+
+    def summary(self):
+        """返回 /api/stats 的响应数据"""
+        if self._summary is None:
+            totals = self._base_stats['total']
+            self._summary = {
+                "total_pokemon": self._pokemon_count,
+                "total_items": self._item_count,
+                "total_moves": self._move_count,
+                "type_distribution": dict(self._type_stats),
+                "item_category_distribution": dict(self._item_category_stats),
+                "move_type_distribution": dict(self._move_type_stats),
+                "stats_summary": {
+                    "total_avg": self._average('total'),
+                    "total_max": max(totals) if totals else 0,
+                    "total_min": min(totals) if totals else 0,
+                    "hp_avg": self._average('hp'),
+                    "attack_avg": self._average('attack')
+                }
+            }
+        return self._summary
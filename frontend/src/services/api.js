@@ -23,6 +23,10 @@ api.interceptors.request.use(
 // 响应拦截器
 api.interceptors.response.use(
   response => {
+    // 需要读取响应头（如分页游标）的请求返回完整响应
+    if (response.config.fullResponse) {
+      return response
+    }
     return response.data
   },
   error => {
@@ -41,6 +45,15 @@ api.interceptors.response.use(
   }
 )
 
+// 按游标获取一页列表，返回 { data, nextCursor }（下一页的游标在响应头 X-Next-Cursor 中，没有下一页时为 null）
+async function getPage(url, params) {
+  const response = await api.get(url, { params, fullResponse: true })
+  return {
+    data: response.data,
+    nextCursor: response.headers['x-next-cursor'] || null
+  }
+}
+
 // API方法
 export const pokemonAPI = {
   // 获取宝可梦列表
@@ -48,6 +61,11 @@ export const pokemonAPI = {
     return api.get('/pokemon', { params })
   },
 
+  // 按游标获取一页宝可梦，返回 { data, nextCursor }
+  getPokemonPage(params = {}) {
+    return getPage('/pokemon', params)
+  },
+
   // 获取单个宝可梦详情
   getPokemonById(id) {
     return api.get(`/pokemon/${id}`)
@@ -58,21 +76,46 @@ export const pokemonAPI = {
     return api.get(`/pokemon/search/${name}`)
   },
 
+  // 全文搜索宝可梦、技能和物品，params: { q, source, skip, limit }
+  search(params = {}) {
+    return api.get('/search', { params })
+  },
+
   // 获取宝可梦进化信息
   getPokemonEvolutions(id) {
     return api.get(`/pokemon/${id}/evolutions`)
   },
 
+  // 获取宝可梦的完整进化家族（包含所有分支和结构化进化条件）
+  getPokemonFamily(id) {
+    return api.get(`/pokemon/${id}/family`)
+  },
+
+  // 获取宝可梦可以学会的技能（按学习方式分组）
+  getPokemonMoves(id) {
+    return api.get(`/pokemon/${id}/moves`)
+  },
+
   // 获取物品列表
   getItems(params = {}) {
     return api.get('/items', { params })
   },
 
+  // 按游标获取一页物品，返回 { data, nextCursor }
+  getItemsPage(params = {}) {
+    return getPage('/items', params)
+  },
+
   // 获取技能列表
   getMoves(params = {}) {
     return api.get('/moves', { params })
   },
 
+  // 按游标获取一页技能，返回 { data, nextCursor }
+  getMovesPage(params = {}) {
+    return getPage('/moves', params)
+  },
+
   // 获取物品类别
   getItemCategories() {
     return api.get('/items/categories')
@@ -1,7 +1,10 @@
 import json
 import os
 import time
-from fastapi import FastAPI, HTTPException, Query
+import asyncio
+import hashlib
+import contextvars
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
@@ -17,7 +20,15 @@ sys.path.insert(0, db_path)
 try:
     from database import (
         get_all_pokemon, get_pokemon_by_id, init_db,
-        get_all_items, get_all_moves, get_evolutions
+        get_evolution_family, get_pokemon_moves,
+        get_mega_gmax_form_names,
+        get_data_version, DATASET_PATH,
+        load_stats_materializer,
+        query_pokemon, query_moves, query_items, get_distinct_values, search_all,
+        encode_cursor, decode_cursor,
+        enable_memory_replica, get_memory_replica_stats,
+        build_memory_replica, publish_memory_replica, get_memory_replica, pinned_memory_replica,
+        run_db
     )
     print("数据库模块导入成功")
 except ImportError as e:
@@ -28,16 +39,90 @@ except ImportError as e:
         get_all_pokemon = database.get_all_pokemon
         get_pokemon_by_id = database.get_pokemon_by_id
         init_db = database.init_db
-        get_all_items = database.get_all_items
-        get_all_moves = database.get_all_moves
-        get_evolutions = database.get_evolutions
+        get_evolution_family = database.get_evolution_family
+        get_pokemon_moves = database.get_pokemon_moves
+        get_mega_gmax_form_names = database.get_mega_gmax_form_names
+        get_data_version = database.get_data_version
+        DATASET_PATH = database.DATASET_PATH
+        load_stats_materializer = database.load_stats_materializer
+        query_pokemon = database.query_pokemon
+        query_moves = database.query_moves
+        query_items = database.query_items
+        get_distinct_values = database.get_distinct_values
+        search_all = database.search_all
+        encode_cursor = database.encode_cursor
+        decode_cursor = database.decode_cursor
+        enable_memory_replica = database.enable_memory_replica
+        get_memory_replica_stats = database.get_memory_replica_stats
+        build_memory_replica = database.build_memory_replica
+        publish_memory_replica = database.publish_memory_replica
+        get_memory_replica = database.get_memory_replica
+        pinned_memory_replica = database.pinned_memory_replica
+        run_db = database.run_db
         print("备用导入方式成功")
     except ImportError as e2:
         print(f"备用导入也失败: {e2}")
         raise
 
+from pokemon_index import PokemonIndex, GEN_RANGES
+from gender_ratio import GENDER_FILTERS
+from evolution_graph import EvolutionGraph
+from dataset import compile_dataset, open_dataset
+from cache import cache_region, cache_stats, invalidate_all
+
 app = FastAPI(title="宝可梦图鉴 API", description="提供宝可梦数据的REST API")
 
+# 不参与条件请求的接口（内容随请求变化，与数据版本无关）
+ETAG_EXCLUDED_PATHS = {"/api/cache/stats"}
+
+def make_etag(version):
+    """由数据版本生成ETag，同一数据版本下 /api/* 的响应内容不变"""
+    return '"' + hashlib.sha1(version.encode("utf-8")).hexdigest()[:20] + '"'
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 是否命中（弱比较，支持多个值和 *）"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+# 每个请求固定使用开始时的快照及其内存副本：ETag、预序列化响应的标签和查询读到的数据属于同一个数据版本，
+# 后台刷新在请求处理中途发布新快照时也不会混用新旧数据
+# 条件请求：ETag 命中时直接返回304，不执行接口函数
+# 需要在CORS中间件之前注册，使304响应同样带有跨域响应头
+@app.middleware("http")
+async def conditional_get(request, call_next):
+    path = request.url.path
+    # 静态文件等非 /api/* 请求不读取数据，不检查数据版本也不固定快照
+    if not path.startswith("/api/"):
+        return await call_next(request)
+
+    await ensure_cache_fresh()
+    snapshot = _snapshot
+    token = _request_snapshot.set(snapshot)
+    try:
+        with pinned_memory_replica(snapshot.replica):
+            if request.method not in ("GET", "HEAD") or path in ETAG_EXCLUDED_PATHS:
+                return await call_next(request)
+
+            # ETag 对应本次请求使用的快照（后台刷新完成前仍是旧快照的版本）
+            etag = make_etag(snapshot.version)
+            if_none_match = request.headers.get("if-none-match")
+            if if_none_match and etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+            response = await call_next(request)
+            if response.status_code == 200:
+                response.headers["ETag"] = etag
+                # 允许浏览器缓存，但每次使用前都带ETag重新验证
+                response.headers["Cache-Control"] = "no-cache"
+            return response
+    finally:
+        _request_snapshot.reset(token)
+
 # 允许前端跨域请求（开发时必需）
 app.add_middleware(
     CORSMiddleware,
@@ -45,6 +130,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Pydantic模型
@@ -72,32 +158,189 @@ class Pokemon(BaseModel):
 # 更新forward references
 Pokemon.model_rebuild()
 
+# 数据集不纳入版本管理：启动时增量编译（源文件没有变化时只检查文件状态），
+# 数据库迁移中的回填和进化图都从数据集读取
+compile_dataset(DATASET_PATH)
+
 # 初始化数据库
 init_db()
 
+# 接口只读取数据：查询走内存中的数据库副本，磁盘文件只由导入工具写入
+SERVE_FROM_MEMORY = True
+if SERVE_FROM_MEMORY:
+    enable_memory_replica()
+
 # 缓存宝可梦数据
-_pokemon_cache = None
-_cache_timestamp = 0
 CACHE_DURATION = 3600  # 缓存1小时
+RESPONSE_CACHE_SIZE = 512  # 预序列化列表响应的最大条数
+DETAIL_CACHE_SIZE = 2048   # 预编码详情响应的最大条数
+
+def encode_json(content):
+    """按FastAPI默认的JSON格式编码为字节"""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class PokemonSnapshot:
+    """
+    一次加载得到的全部宝可梦服务数据，作为整体替换，请求不会混用新旧数据
+    """
+
+    def __init__(self, pokemon_list, index, evolution_graph, stats, version, replica=None):
+        self.pokemon_list = pokemon_list
+        self.index = index
+        self.evolution_graph = evolution_graph
+        self.stats = stats
+        self.version = version
+        # 加载快照时读取的内存副本，与快照一起发布；使用这个快照的请求只查询这个副本
+        self.replica = replica
+        self.timestamp = time.time()
+
+_snapshot = None
+# 当前请求固定使用的快照（见 conditional_get）
+_request_snapshot = contextvars.ContextVar("request_snapshot", default=None)
+# 预序列化的响应，按快照的数据版本失效
+_response_cache = cache_region("pokemon_list_responses", max_entries=RESPONSE_CACHE_SIZE)
+_detail_cache = cache_region("pokemon_detail_responses", max_entries=DETAIL_CACHE_SIZE)
+
+def build_pokemon_snapshot():
+    """
+    加载新的快照（启动时和后台刷新时调用，不在请求中执行）
+    磁盘数据版本变化时先建立新的内存副本，快照中的数据都从这个副本读取，快照的版本就是副本的版本
+    """
+    print("加载宝可梦数据到缓存...")
+    current = _snapshot
+    replica = None
+    if SERVE_FROM_MEMORY:
+        replica = current.replica if current is not None else get_memory_replica()
+        if replica.version != get_data_version():
+            replica = build_memory_replica()
+    with pinned_memory_replica(replica):
+        # 没有副本时先记录数据版本再读取数据，加载期间数据变化时下一次检查会再次刷新
+        version = replica.version if replica is not None else get_data_version()
+        pokemon_list = get_all_pokemon()
+        # 数据版本变化时重建统计信息和进化图
+        stats = load_stats_materializer(pokemon_list=pokemon_list)
+        graph = current.evolution_graph if current is not None else None
+        if graph is None or graph.version != version:
+            # 进化字段从打包的数据集按编号读取；数据集缺失时进化链会全部为空，不能继续
+            dataset = open_dataset(DATASET_PATH)
+            if dataset is None:
+                raise RuntimeError(f"数据集不存在，无法构建进化图: {DATASET_PATH}（运行 python db/dataset.py 编译）")
+            with dataset:
+                graph = EvolutionGraph(pokemon_list, dataset, version)
+        return PokemonSnapshot(pokemon_list, PokemonIndex(pokemon_list), graph, stats, version, replica)
+
+def install_pokemon_snapshot(snapshot):
+    """
+    发布快照和它的内存副本（启动时或在事件循环线程中调用，中间没有 await，请求不会看到只换了一半的状态）
+    """
+    global _snapshot
+    if _snapshot is None or _snapshot.version != snapshot.version:
+        # 释放所有缓存区域中旧版本的条目（不清理时也会在下次读取时按版本标签失效）
+        invalidate_all(snapshot.version)
+    if snapshot.replica is not None:
+        publish_memory_replica(snapshot.replica)
+    _snapshot = snapshot
+    print(f"宝可梦数据加载完成，共 {len(snapshot.pokemon_list)} 个宝可梦")
 
 # 加载宝可梦数据到缓存
 def load_pokemon_cache():
-    global _pokemon_cache, _cache_timestamp
-    print("加载宝可梦数据到缓存...")
-    _pokemon_cache = get_all_pokemon()
-    _cache_timestamp = time.time()
-    print(f"宝可梦数据加载完成，共 {len(_pokemon_cache)} 个宝可梦")
+    install_pokemon_snapshot(build_pokemon_snapshot())
 
 # 初始化时加载缓存
 load_pokemon_cache()
 
+# 刷新失败后的重试间隔：第 n 次连续失败后等待 REFRESH_RETRY_DELAY * 2^(n-1) 秒，最多 CACHE_DURATION
+REFRESH_RETRY_DELAY = 5
+
+# 后台刷新任务（同一时间最多一个）及其统计
+_refresh_task = None
+_refresh_stats = {"refreshes": 0, "failures": 0, "consecutive_failures": 0, "last_duration": 0.0}
+# 上一次加载（启动加载或后台刷新，无论成功与否）开始的时间和当时的数据版本
+_last_refresh = {"time": _snapshot.timestamp, "version": _snapshot.version}
+
+def refresh_retry_delay():
+    """连续失败后下一次刷新前至少等待的秒数（没有失败时为0）"""
+    failures = _refresh_stats["consecutive_failures"]
+    if failures == 0:
+        return 0
+    return min(REFRESH_RETRY_DELAY * 2 ** (failures - 1), CACHE_DURATION)
+
+def refresh_is_due():
+    """
+    距上一次加载超过 CACHE_DURATION，或数据版本与上一次加载时不同，并且已过失败后的重试间隔
+    按上一次加载而不是当前快照判断：加载失败时快照不变，不会让之后的每个请求都再次触发重建
+    """
+    elapsed = time.time() - _last_refresh["time"]
+    if elapsed < refresh_retry_delay():
+        return False
+    return elapsed > CACHE_DURATION or _last_refresh["version"] != get_data_version()
+
+async def refresh_pokemon_cache():
+    """在数据库线程池中重建缓存，失败时继续使用旧快照"""
+    start = time.time()
+    _last_refresh.update(time=start, version=get_data_version())
+    try:
+        # 在后台线程中建立副本和加载快照，回到事件循环后一起发布
+        snapshot = await run_db(build_pokemon_snapshot)
+        install_pokemon_snapshot(snapshot)
+        _refresh_stats["refreshes"] += 1
+        _refresh_stats["consecutive_failures"] = 0
+    except Exception as e:
+        _refresh_stats["failures"] += 1
+        _refresh_stats["consecutive_failures"] += 1
+        print(f"后台刷新宝可梦缓存失败（{refresh_retry_delay()} 秒内不再重试）: {e}")
+    finally:
+        _refresh_stats["last_duration"] = time.time() - start
+
+def schedule_refresh():
+    """启动后台刷新；已有刷新在进行时直接复用（single-flight）"""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(refresh_pokemon_cache())
+    return _refresh_task
+
+async def ensure_cache_fresh():
+    """
+    缓存过期或数据版本变化时在后台重新加载（stale-while-revalidate）
+    刷新完成前请求继续使用旧快照；宝可梦索引、进化图、技能/物品目录和统计信息一起刷新
+    """
+    if (_refresh_task is None or _refresh_task.done()) and refresh_is_due():
+        schedule_refresh()
+
+async def get_pokemon_snapshot():
+    """返回本次请求固定使用的宝可梦数据快照；不在请求中时返回当前快照"""
+    snapshot = _request_snapshot.get()
+    if snapshot is None:
+        await ensure_cache_fresh()
+        snapshot = _snapshot
+    return snapshot
+
+def set_next_cursor(response, next_after_id):
+    """
+    还有下一页时把下一页的游标放在响应头 X-Next-Cursor 中（三个列表接口相同）
+    宝可梦列表的响应体是数组，游标不放在响应体中，各接口的响应体格式保持不变
+    """
+    if next_after_id is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(next_after_id)
+
+def parse_cursor(cursor):
+    """解析分页游标，返回上一页最后一条的id；未传游标时返回 None"""
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
 @app.get("/api/pokemon", response_model=List[Pokemon])
 async def get_pokemon(
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(50, ge=1, le=100, description="返回的记录数"),
     type_filter: Optional[str] = Query(None, description="按属性过滤"),
     search: Optional[str] = Query(None, description="搜索宝可梦名称"),
-    generation: Optional[int] = Query(None, description="按世代过滤")
+    generation: Optional[int] = Query(None, description="按世代过滤"),
+    gender: Optional[str] = Query(None, description="按性别过滤（mixed）"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页响应头 X-Next-Cursor 的值）")
 ):
     """
     获取宝可梦列表
@@ -107,103 +350,68 @@ async def get_pokemon(
     - **type_filter**: 按属性过滤（如 "Fire"）
     - **search**: 搜索宝可梦名称
     - **generation**: 按世代过滤（1-9）
+    - **gender**: 按性别过滤：mixed 雌雄都有（数据中有雌雄比例记录的宝可梦）
+    - **cursor**: 分页游标，从上一页最后一个宝可梦之后继续；还有下一页时响应头 X-Next-Cursor 给出下一页的游标
     """
-    global _pokemon_cache, _cache_timestamp
-    
-    # 检查缓存是否过期
-    current_time = time.time()
-    if _pokemon_cache is None or current_time - _cache_timestamp > CACHE_DURATION:
-        load_pokemon_cache()
-    
-    all_pokemon = _pokemon_cache
-
-    # 世代过滤
-    if generation:
-        # 世代与编号范围的映射
-        gen_ranges = {
-            1: (1, 151),
-            2: (152, 251),
-            3: (252, 386),
-            4: (387, 493),
-            5: (494, 649),
-            6: (650, 721),
-            7: (722, 809),
-            8: (810, 905),
-            9: (906, 1025)
-        }
-        
-        if generation in gen_ranges:
-            start, end = gen_ranges[generation]
-            all_pokemon = [
-                p for p in all_pokemon
-                if start <= p['id'] <= end
-            ]
-
-    # 搜索过滤
-    if search:
-        search_lower = search.lower()
-        # 检查是否为数字，用于按序号搜索
-        if search.isdigit():
-            search_id = int(search)
-            all_pokemon = [
-                p for p in all_pokemon
-                if p['id'] == search_id or
-                   search_lower in p['name'].lower() or
-                   (p.get('en_name') and search_lower in p['en_name'].lower()) or
-                   (p.get('jp_name') and search_lower in p['jp_name'].lower())
-            ]
-        else:
-            all_pokemon = [
-                p for p in all_pokemon
-                if search_lower in p['name'].lower() or
-                   (p.get('en_name') and search_lower in p['en_name'].lower()) or
-                   (p.get('jp_name') and search_lower in p['jp_name'].lower())
-            ]
-
-    # 属性过滤
-    if type_filter:
-        type_filter_lower = type_filter.lower()
-        all_pokemon = [
-            p for p in all_pokemon
-            if type_filter_lower in p['type1'].lower() or
-               (p.get('type2') and type_filter_lower in p['type2'].lower())
-        ]
-
-    # 分页
-    total = len(all_pokemon)
-    pokemon_list = all_pokemon[skip:skip + limit]
-
-    return pokemon_list
+    after_id = parse_cursor(cursor)
+    snapshot = await get_pokemon_snapshot()
+
+    # 规范化查询参数：过滤条件不区分大小写，空值和未知世代等同于不过滤
+    cache_key = (
+        skip, limit, after_id,
+        type_filter.lower() if type_filter else None,
+        search.lower() if search else None,
+        generation if generation in GEN_RANGES else None,
+        gender if gender in GENDER_FILTERS else None
+    )
+    cached = _response_cache.get(cache_key, snapshot.version)
+    if cached is None:
+        # 世代、搜索、属性过滤和分页都在SQL中完成，只校验和编码当前页
+        # 列表接口不返回总数，不执行 COUNT(*)
+        pokemon_list, _, next_after_id = await run_db(
+            query_pokemon, skip=skip, limit=limit,
+            type_filter=type_filter, search=search, generation=generation, after_id=after_id,
+            gender=gender, with_total=False
+        )
+        body = b"[" + b",".join(
+            Pokemon.model_validate(p).model_dump_json().encode("utf-8") for p in pokemon_list
+        ) + b"]"
+        cached = (body, next_after_id)
+        _response_cache.put(cache_key, cached, snapshot.version)
+
+    body, next_after_id = cached
+    # 直接返回字节，跳过 response_model 的校验和序列化
+    response = Response(content=body, media_type="application/json")
+    set_next_cursor(response, next_after_id)
+    return response
 
 @app.get("/api/pokemon/{pokemon_id}")
 async def get_single_pokemon(pokemon_id: int):
     """
     根据ID获取单个宝可梦信息
     """
-    print(f"收到请求: GET /api/pokemon/{pokemon_id}")
+    snapshot = await get_pokemon_snapshot()
+    body = _detail_cache.get(pokemon_id, snapshot.version)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+
     try:
-        print(f"调用数据库查询: get_pokemon_by_id({pokemon_id})")
-        print(f"函数类型: {type(get_pokemon_by_id)}")
-        pokemon = get_pokemon_by_id(pokemon_id)
-        print(f"数据库返回类型: {type(pokemon)}")
-        print(f"数据库返回: {pokemon}")
+        pokemon = await run_db(get_pokemon_by_id, pokemon_id)
 
         if not pokemon:
-            print(f"宝可梦 {pokemon_id} 未找到")
             raise HTTPException(status_code=404, detail="宝可梦未找到")
 
         # 查找mega和gmax形态
         base_name = pokemon['name']
-        mega_gmax_forms = find_mega_gmax_forms(pokemon_id, base_name)
-        pokemon['mega_gmax_forms'] = mega_gmax_forms
+        pokemon['mega_gmax_forms'] = await run_db(find_mega_gmax_forms, pokemon_id, base_name)
 
-        print(f"返回宝可梦数据: {pokemon.get('name', 'Unknown') if isinstance(pokemon, dict) else 'Not dict'}")
-        return pokemon
+        body = encode_json(pokemon)
+        _detail_cache.put(pokemon_id, body, snapshot.version)
+        return Response(content=body, media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
         print(f"Error getting pokemon {pokemon_id}: {e}")
-        print(f"Error type: {type(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
@@ -213,30 +421,9 @@ async def search_pokemon_by_name(name: str):
     """
     根据名称或序号搜索宝可梦
     """
-    all_pokemon = get_all_pokemon()
-    name_lower = name.lower()
-
-    results = []
-    seen_ids = set()  # 用于跟踪已添加的宝可梦ID，避免重复
-    
-    for p in all_pokemon:
-        # 检查是否为数字，用于按序号搜索
-        if name.isdigit():
-            search_id = int(name)
-            if (p['id'] == search_id or
-                name_lower in p['name'].lower() or
-                (p.get('en_name') and name_lower in p['en_name'].lower()) or
-                (p.get('jp_name') and name_lower in p['jp_name'].lower())) and \
-               p['id'] not in seen_ids:
-                results.append(p)
-                seen_ids.add(p['id'])
-        else:
-            if (name_lower in p['name'].lower() or
-                (p.get('en_name') and name_lower in p['en_name'].lower()) or
-                (p.get('jp_name') and name_lower in p['jp_name'].lower())) and \
-               p['id'] not in seen_ids:
-                results.append(p)
-                seen_ids.add(p['id'])
+    # 名称子串和序号匹配都由搜索索引完成
+    snapshot = await get_pokemon_snapshot()
+    results = snapshot.index.search(name)
 
     if not results:
         raise HTTPException(status_code=404, detail="未找到匹配的宝可梦")
@@ -245,80 +432,48 @@ async def search_pokemon_by_name(name: str):
 
 @app.get("/api/items")
 async def get_items(
+    response: Response,
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(50, ge=1, le=100, description="返回的记录数"),
     category_filter: Optional[str] = Query(None, description="按类别过滤"),
-    search: Optional[str] = Query(None, description="搜索物品名称")
+    search: Optional[str] = Query(None, description="搜索物品名称"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页响应头 X-Next-Cursor 的值）")
 ):
     """
     获取物品列表
     """
-    all_items = get_all_items()
-
-    # 搜索过滤
-    if search:
-        search_lower = search.lower()
-        all_items = [
-            i for i in all_items
-            if search_lower in i['name'].lower() or
-               (i.get('english') and search_lower in i['english'].lower())
-        ]
-
-    # 类别过滤
-    if category_filter:
-        category_filter_lower = category_filter.lower()
-        all_items = [
-            i for i in all_items
-            if i.get('category') and category_filter_lower in i['category'].lower()
-        ]
-
-    # 分页
-    total = len(all_items)
-    items_list = all_items[skip:skip + limit]
+    after_id = parse_cursor(cursor)
+    # 搜索、类别过滤和分页都在SQL中完成
+    items_list, total, next_after_id = await run_db(
+        query_items, skip=skip, limit=limit, category_filter=category_filter, search=search,
+        after_id=after_id
+    )
 
+    set_next_cursor(response, next_after_id)
     return {"items": items_list, "total": total, "skip": skip, "limit": limit}
 
 @app.get("/api/moves")
 async def get_moves(
+    response: Response,
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(50, ge=1, le=100, description="返回的记录数"),
     type_filter: Optional[str] = Query(None, description="按属性过滤"),
     category_filter: Optional[str] = Query(None, description="按类别过滤"),
-    search: Optional[str] = Query(None, description="搜索技能名称")
+    search: Optional[str] = Query(None, description="搜索技能名称"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页响应头 X-Next-Cursor 的值）")
 ):
     """
     获取技能列表
     """
-    all_moves = get_all_moves()
-
-    # 搜索过滤
-    if search:
-        search_lower = search.lower()
-        all_moves = [
-            m for m in all_moves
-            if search_lower in m['name'].lower()
-        ]
-
-    # 属性过滤
-    if type_filter:
-        type_filter_lower = type_filter.lower()
-        all_moves = [
-            m for m in all_moves
-            if m.get('type') and type_filter_lower in m['type'].lower()
-        ]
-
-    # 类别过滤
-    if category_filter:
-        category_filter_lower = category_filter.lower()
-        all_moves = [
-            m for m in all_moves
-            if m.get('category') and category_filter_lower in m['category'].lower()
-        ]
-
-    # 分页
-    total = len(all_moves)
-    moves_list = all_moves[skip:skip + limit]
+    after_id = parse_cursor(cursor)
+    # 搜索、属性和类别过滤以及分页都在SQL中完成
+    moves_list, total, next_after_id = await run_db(
+        query_moves, skip=skip, limit=limit,
+        type_filter=type_filter, category_filter=category_filter, search=search,
+        after_id=after_id
+    )
 
+    set_next_cursor(response, next_after_id)
     return {"moves": moves_list, "total": total, "skip": skip, "limit": limit}
 
 @app.get("/api/items/categories")
@@ -326,372 +481,118 @@ async def get_item_categories():
     """
     获取所有物品类别
     """
-    all_items = get_all_items()
-    categories = set()
-    
-    for item in all_items:
-        if item.get('category'):
-            categories.add(item['category'])
-    
-    return {"categories": sorted(list(categories))}
+    return {"categories": await run_db(get_distinct_values, "items", "category")}
 
 @app.get("/api/moves/filters")
 async def get_move_filters():
     """
     获取技能过滤选项（属性和类别）
     """
-    all_moves = get_all_moves()
-    types = set()
-    categories = set()
-    
-    for move in all_moves:
-        if move.get('type'):
-            types.add(move['type'])
-        if move.get('category'):
-            categories.add(move['category'])
-    
-    return {"types": sorted(list(types)), "categories": sorted(list(categories))}
+    return {
+        "types": await run_db(get_distinct_values, "moves", "type"),
+        "categories": await run_db(get_distinct_values, "moves", "category")
+    }
+
+@app.get("/api/search")
+async def search(
+    q: str = Query(..., min_length=1, description="搜索关键词（多个词用空格分隔，需全部匹配）"),
+    source: Optional[str] = Query(None, description="只搜索 pokemon、moves 或 items"),
+    skip: int = Query(0, ge=0, description="跳过的记录数"),
+    limit: int = Query(20, ge=1, le=100, description="返回的记录数")
+):
+    """
+    全文搜索宝可梦（名称、图鉴描述）、技能（名称、描述）和物品（名称、描述）
+    结果按相关度排序，snippet 是已转义的HTML，匹配的文字用 <mark> 标出
+    """
+    try:
+        results, total = await run_db(search_all, q, skip=skip, limit=limit, source=source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"query": q, "results": results, "total": total, "skip": skip, "limit": limit}
 
 @app.get("/api/pokemon/{pokemon_id}/evolutions")
 async def get_pokemon_evolutions(pokemon_id: int):
     """
     获取宝可梦的完整进化信息
     """
-    # 获取当前宝可梦的信息
-    current_pokemon = get_pokemon_by_id(pokemon_id)
-    if not current_pokemon:
-        return {"evolutions": []}
-
-    current_name = current_pokemon['name'].lower()
-
-    # 从JSON文件中获取进化信息
-    pokemon_data_file = f"backend/spider/pokemon_data_all/{pokemon_id}_{current_name}.json"
-    if os.path.exists(pokemon_data_file):
-        try:
-            with open(pokemon_data_file, 'r', encoding='utf-8') as f:
-                pokemon_data = json.load(f)
-
-            # 构建完整的进化链
-            full_evolution_chain = build_full_evolution_chain(current_name)
-
-            return {"evolutions": full_evolution_chain}
-
-        except Exception as e:
-            print(f"读取宝可梦数据文件失败: {e}")
-
-    # 如果没有找到文件，返回空数组
-    return {"evolutions": []}
-
-def build_full_evolution_chain(start_name):
-    """
-    从给定的宝可梦名称开始，构建完整的进化链
-    """
-    chain = []
-    visited = set()
-
-    def find_base_form(name):
-        """递归查找基础形态"""
-        if name in visited:
-            return None
-        visited.add(name)
-
-        # 查找这个宝可梦的数据文件
-        pokemon_id = find_pokemon_id_by_name(name)
-        if not pokemon_id:
-            return None
-
-        data_file = f"backend/spider/pokemon_data_all/{pokemon_id}_{name.lower()}.json"
-        if not os.path.exists(data_file):
-            return None
-
-        try:
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            # 如果有上一形态，继续递归
-            if data.get('prevo'):
-                base = find_base_form(data['prevo'])
-                if base:
-                    return base
-
-            # 没有上一形态了，这就是基础形态
-            return name
-
-        except Exception as e:
-            print(f"读取数据文件失败 {name}: {e}")
-            return None
-
-    def build_chain_with_branches(current_name, current_chain, step_count):
-        """递归构建带分支的进化链"""
-        if current_name in visited or step_count >= 10:  # 防止无限循环
-            return
-
-        # 查找这个宝可梦的数据
-        pokemon_id = find_pokemon_id_by_name(current_name)
-        if not pokemon_id:
-            return
-
-        data_file = f"backend/spider/pokemon_data_all/{pokemon_id}_{current_name.lower()}.json"
-        if not os.path.exists(data_file):
-            return
-
-        try:
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            # 创建当前宝可梦的进化信息
-            current_pokemon = {
-                "id": pokemon_id,
-                "name": current_name,
-                "condition": format_evolution_condition(data) if step_count > 0 else None
-            }
-
-            # 添加到当前链
-            new_chain = current_chain + [current_pokemon]
-
-            # 如果没有更多进化形态，将当前链添加到结果中
-            if not data.get('evos') or len(data['evos']) == 0:
-                # 检查是否已经添加过相同的链
-                chain_exists = False
-                for existing_chain in chain:
-                    if len(existing_chain) == len(new_chain):
-                        match = True
-                        for i in range(len(existing_chain)):
-                            if existing_chain[i]['name'] != new_chain[i]['name']:
-                                match = False
-                                break
-                        if match:
-                            chain_exists = True
-                            break
-                if not chain_exists:
-                    chain.append(new_chain)
-                return
-
-            # 标记当前宝可梦为已访问
-            visited.add(current_name)
-
-            # 处理每个进化形态（分支进化）
-            for i, evo_name in enumerate(data['evos']):
-                # 对于非第一个进化形态，创建新的分支链
-                build_chain_with_branches(evo_name, new_chain, step_count + 1)
-
-        except Exception as e:
-            print(f"读取数据文件失败 {current_name}: {e}")
-
-    # 找到基础形态
-    base_form = find_base_form(start_name)
-    if base_form:
-        # 清空visited集合，为构建链做准备
-        visited.clear()
-        # 从基础形态开始构建完整链
-        build_chain_with_branches(base_form, [], 0)
-
-    return chain
+    # 进化图在加载缓存时构建，这里只按链长查表
+    snapshot = await get_pokemon_snapshot()
+    return {"evolutions": snapshot.evolution_graph.get_evolution_chains(pokemon_id)}
+
+@app.get("/api/pokemon/{pokemon_id}/family")
+async def get_pokemon_evolution_family(pokemon_id: int):
+    """
+    获取宝可梦所在的完整进化家族（包含所有分支），每个成员带有进化前形态的编号和结构化进化条件
+    """
+    family = await run_db(get_evolution_family, pokemon_id)
+    if not family or family[0]['name'] is None:
+        raise HTTPException(status_code=404, detail="宝可梦不存在")
+    return {"family": family}
+
+@app.get("/api/pokemon/{pokemon_id}/moves")
+async def get_pokemon_learnset(pokemon_id: int):
+    """
+    获取宝可梦可以学会的技能，按学习方式分组（level_up 升级、egg 蛋招式、tm 技能机器、tutor 教学招式）
+    """
+    moves = await run_db(get_pokemon_moves, pokemon_id)
+    total = sum(len(group) for group in moves.values())
+    # 没有技能时再确认宝可梦是否存在
+    if total == 0 and not await run_db(get_pokemon_by_id, pokemon_id):
+        raise HTTPException(status_code=404, detail="宝可梦不存在")
+    return {"pokemon_id": pokemon_id, "moves": moves, "total": total}
 
 def find_mega_gmax_forms(pokemon_id, base_name):
     """
     查找宝可梦的mega和gmax形态
     """
     mega_gmax_forms = []
-    
-    # 遍历宝可梦数据目录，查找包含mega或gmax的文件
-    data_dir = "backend/spider/pokemon_data_all"
-    if os.path.exists(data_dir):
-        for filename in os.listdir(data_dir):
-            if filename.startswith(f"{pokemon_id}_"):
-                # 提取文件名中的宝可梦名称（不含id和扩展名）
-                name_part = filename[len(f"{pokemon_id}_"):-5]  # 移除id_前缀和.json后缀
-                
-                # 只检查mega和gmax形态
-                if any(keyword in name_part.lower() for keyword in ['mega', 'gmax']):
-                    # 构建完整的宝可梦名称
-                    full_name = base_name
-                    
-                    # 处理mega和gmax形态
-                    if 'megax' in name_part.lower():
-                        full_name = base_name + '-Mega-X'
-                    elif 'megay' in name_part.lower():
-                        full_name = base_name + '-Mega-Y'
-                    elif 'mega' in name_part.lower():
-                        full_name = base_name + '-Mega'
-                    elif 'gmax' in name_part.lower():
-                        full_name = base_name + '-Gmax'
-                    
-                    mega_gmax_forms.append({
-                        "id": pokemon_id,
-                        "name": full_name,
-                        "form_name": name_part
-                    })
-    
-    return mega_gmax_forms
 
-def format_evolution_condition(pokemon_data):
-    """根据宝可梦数据格式化进化条件"""
-    evo_type = pokemon_data.get('evo_type')
-    evo_level = pokemon_data.get('evo_level')
-    evo_item = pokemon_data.get('evo_item')
-
-    # 处理不同的进化类型
-    if evo_type == 'levelFriendship':
-        return "亲密度"
-    elif evo_type == 'useItem' and evo_item:
-        # 翻译常见的进化物品
-        item_translations = {
-            'Thunder Stone': '雷之石',
-            'Fire Stone': '火之石',
-            'Water Stone': '水之石',
-            'Leaf Stone': '叶之石',
-            'Moon Stone': '月之石',
-            'Sun Stone': '太阳石',
-            'Shiny Stone': '光之石',
-            'Dusk Stone': '暗之石',
-            'Dawn Stone': '觉醒之石',
-            'Ice Stone': '冰之石',
-            'Metal Alloy': '合金块',
-            'Syrupy Apple': '蜜汁苹果',
-            'Unremarkable Teacup': '不起眼的茶碗',
-            'Masterpiece Teacup': '杰作茶碗',
-            'Galarica Wreath': '伽勒尔花冠',
-            'Dragon Scale': '龙之鳞片',
-            'King\'s Rock': '王者之证',
-            'Deep Sea Tooth': '深海之牙',
-            'Deep Sea Scale': '深海鳞片',
-            'Upgrade': '金属膜',
-            'Protector': '防护罩',
-            'Electirizer': '电引擎',
-            'Magmarizer': '熔岩引擎',
-            'Dubious Disc': '可疑补丁',
-            'Reaper Cloth': '怨念布',
-            'Prism Scale': '美丽鳞片',
-            'Whipped Dream': '泡绵奶油',
-            'Sachet': '香袋',
-            'Razor Claw': '锐利之爪',
-            'Razor Fang': '锐利之牙',
-            'Auspicious Armor': '吉利拳套',          # 朱／紫 新增
-            'Malicious Armor': '凶恶拳套',          # 朱／紫 新增
-            'Peat Block': '泥炭块',                # 朱／紫 DLC 新增（用于土王进化）
-            'Linking Cord': '连接线绳',             # 朱／紫 新增（快速进化，如小箭雀→火箭雀）
-            'Cracked Pot': '裂纹壶',               # 茶杯系列基础形态
-            'Chipped Pot': '缺角壶',               # 茶杯系列中间形态（非进化道具，但相关）
-        }
-        item_name = item_translations.get(evo_item, evo_item)
-        return f"使用{item_name}"
-    elif evo_type == 'trade' and evo_item:
-        return f"交换（持有{evo_item}）"
-    elif evo_type == 'trade':
-        return "交换"
-    elif evo_type == 'levelMove':
-        return "等级+学习技能"
-    elif evo_type == 'levelHold' and evo_item:
-        return f"等级+持有{evo_item}"
-    elif evo_type == 'levelExtra':
-        return "等级+额外条件"
-    elif evo_type == 'other':
-        return "特殊进化"
-    elif evo_level:
-        return f"等级{evo_level}"
-    else:
-        return "进化条件未知"
-
-def find_pokemon_id_by_name(name):
-    """根据宝可梦名称查找ID"""
-    try:
-        all_pokemon = get_all_pokemon()
-        for pokemon in all_pokemon:
-            if pokemon['name'].lower() == name.lower():
-                return pokemon['id']
-        return None
-    except Exception as e:
-        print(f"查找宝可梦ID失败: {e}")
-        return None
-
-def get_pokemon_name_by_id(pokemon_id):
-    """根据ID获取宝可梦名称（小写）"""
-    # 这里应该从数据库查询，但为了简化，我们返回一个默认名称
-    return "unknown"
-
-def get_evolution_condition_from_names(base_name, evolved_name):
-    """根据名称获取进化条件"""
-    # 常见进化条件映射（与insert_data.py中的相同）
-    evolution_conditions = {
-        # 喷火龙进化链
-        ("charmander", "charmeleon"): "等级16",
-        ("charmeleon", "charizard"): "等级36",
-        # 妙蛙种子进化链
-        ("bulbasaur", "ivysaur"): "等级16",
-        ("ivysaur", "venusaur"): "等级32",
-        # 杰尼龟进化链
-        ("squirtle", "wartortle"): "等级16",
-        ("wartortle", "blastoise"): "等级36",
-        # 绿毛虫进化链
-        ("caterpie", "metapod"): "等级7",
-        ("metapod", "butterfree"): "等级10",
-        # 其他常见进化
-        ("krabby", "kingler"): "等级28",
-        ("pichu", "pikachu"): "亲密度",
-        ("pikachu", "raichu"): "雷之石",
-    }
+    # 从形态表中读取mega和gmax形态（按形态类别的索引查询，不访问文件系统）
+    for name_part in get_mega_gmax_form_names(pokemon_id):
+        # 构建完整的宝可梦名称
+        full_name = base_name
+
+        # 处理mega和gmax形态
+        if 'megax' in name_part.lower():
+            full_name = base_name + '-Mega-X'
+        elif 'megay' in name_part.lower():
+            full_name = base_name + '-Mega-Y'
+        elif 'mega' in name_part.lower():
+            full_name = base_name + '-Mega'
+        elif 'gmax' in name_part.lower():
+            full_name = base_name + '-Gmax'
+
+        mega_gmax_forms.append({
+            "id": pokemon_id,
+            "name": full_name,
+            "form_name": name_part
+        })
 
-    return evolution_conditions.get((base_name.lower(), evolved_name.lower()), "进化条件未知")
+    return mega_gmax_forms
 
 @app.get("/api/stats")
 async def get_stats():
     """
     获取宝可梦统计信息
     """
-    all_pokemon = get_all_pokemon()
-    all_items = get_all_items()
-    all_moves = get_all_moves()
-
-    # 计算属性分布
-    type_stats = {}
-    for p in all_pokemon:
-        t1 = p['type1']
-        t2 = p.get('type2')
-
-        if t1 not in type_stats:
-            type_stats[t1] = 0
-        type_stats[t1] += 1
-
-        if t2:
-            if t2 not in type_stats:
-                type_stats[t2] = 0
-            type_stats[t2] += 1
-
-    # 物品类别分布
-    item_category_stats = {}
-    for i in all_items:
-        category = i.get('category', '其他')
-        if category not in item_category_stats:
-            item_category_stats[category] = 0
-        item_category_stats[category] += 1
-
-    # 技能属性分布
-    move_type_stats = {}
-    for m in all_moves:
-        move_type = m.get('type', 'Normal')
-        if move_type not in move_type_stats:
-            move_type_stats[move_type] = 0
-        move_type_stats[move_type] += 1
-
-    # 种族值统计
-    total_stats = [p['total'] for p in all_pokemon if p.get('total')]
-    hp_stats = [p['hp'] for p in all_pokemon if p.get('hp')]
-    attack_stats = [p['attack'] for p in all_pokemon if p.get('attack')]
+    # 统计信息按数据版本物化，随快照一起替换
+    snapshot = await get_pokemon_snapshot()
+    return snapshot.stats.summary()
 
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """
+    获取缓存和索引的命中统计
+    """
     return {
-        "total_pokemon": len(all_pokemon),
-        "total_items": len(all_items),
-        "total_moves": len(all_moves),
-        "type_distribution": type_stats,
-        "item_category_distribution": item_category_stats,
-        "move_type_distribution": move_type_stats,
-        "stats_summary": {
-            "total_avg": sum(total_stats) / len(total_stats) if total_stats else 0,
-            "total_max": max(total_stats) if total_stats else 0,
-            "total_min": min(total_stats) if total_stats else 0,
-            "hp_avg": sum(hp_stats) / len(hp_stats) if hp_stats else 0,
-            "attack_avg": sum(attack_stats) / len(attack_stats) if attack_stats else 0
+        "caches": cache_stats(),
+        "memory_replica": get_memory_replica_stats(),
+        "refresh": {
+            **_refresh_stats,
+            "in_progress": _refresh_task is not None and not _refresh_task.done(),
+            "retry_delay": refresh_retry_delay(),
+            "snapshot_age": time.time() - _snapshot.timestamp
         }
     }
 
@@ -723,9 +624,12 @@ async def root():
             "GET /api/pokemon/{id}": "获取单个宝可梦",
             "GET /api/pokemon/search/{name}": "按名称搜索宝可梦",
             "GET /api/pokemon/{id}/evolutions": "获取宝可梦进化信息",
+            "GET /api/pokemon/{id}/family": "获取宝可梦的完整进化家族",
+            "GET /api/pokemon/{id}/moves": "获取宝可梦可以学会的技能（按学习方式分组）",
             "GET /api/items": "获取物品列表（支持分页、搜索、过滤）",
             "GET /api/moves": "获取技能列表（支持分页、搜索、过滤）",
             "GET /api/stats": "获取统计信息",
+            "GET /api/cache/stats": "获取缓存命中统计",
             "GET /images/{filename}": "获取宝可梦图片"
         },
         "docs": "/docs"
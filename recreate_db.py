@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 重新创建数据库脚本
+
+新数据库在 db/pokemon.db 旁边的临时文件中创建并导入全部数据，完成并检查后原子替换原文件；
+失败时原文件保持不变。正在运行的 API 不需要重启，会在下一次请求时发现新文件并切换。
 """
 
 import os
@@ -12,30 +15,17 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 db_path = os.path.join(current_dir, 'db')
 sys.path.insert(0, db_path)
 
-from pokemon_db_init import PokemonDB
+from insert_data import rebuild_database
 
 def recreate_database():
-    """删除并重新创建数据库"""
-    db_file = "db/pokemon.db"
-
-    # 尝试删除现有数据库文件
-    if os.path.exists(db_file):
-        try:
-            os.remove(db_file)
-            print(f"已删除现有数据库文件: {db_file}")
-        except Exception as e:
-            print(f"删除数据库文件失败: {e}")
-            return False
-
-    # 创建新数据库
+    """在临时文件中重新创建数据库并导入全部数据，完成后替换现有数据库文件"""
+    start = time.time()
     try:
-        print("正在创建新数据库...")
-        db = PokemonDB(db_file)
-        db.close()
-        print("数据库创建成功！")
+        rebuild_database()
+        print(f"数据库重建成功！用时 {time.time() - start:.1f} 秒")
         return True
     except Exception as e:
-        print(f"创建数据库失败: {e}")
+        print(f"重建数据库失败（现有数据库未改动）: {e}")
         return False
 
 if __name__ == "__main__":